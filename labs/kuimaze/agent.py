@@ -6,12 +6,23 @@ import heapq
 
 class Agent(kuimaze.SearchAgent):
 
-    def __init__(self, environment):
+    def __init__(self, environment, render=True, method=None):
+        """
+        :param environment: kuimaze.InfEasyMaze
+        :param render: show the progress of the search in the GUI, turn off for benchmarking
+        :param method: None - A* below towards the first goal, otherwise the method of kuimaze.SearchEngine
+        searching towards all goals of the maze ('astar', 'bidirectional', 'jps', 'field')
+        """
         self.environment = environment
+        self.render = render
+        self.method = method
 
-        # currently discovered nodes that are not evaluated yet
+        # currently discovered nodes that are not evaluated yet, may contain outdated nodes (lazy deletion)
         self.__frontier_pq = []
 
+        # g of the best node of a given state on the frontier
+        self.__frontier_g = {}
+
         # the set of already evaluated coordinates (x, y)
         self.__explored_set = set()
 
@@ -30,6 +41,9 @@ class Agent(kuimaze.SearchAgent):
         # max path length constant
         self.__MAX_PATH_LEN = 99999999
 
+        # number of expanded nodes in the last search
+        self.expanded_nodes = 0
+
     # region API Functions
 
     def heuristic_function(self, position, goal):
@@ -38,14 +52,19 @@ class Agent(kuimaze.SearchAgent):
         return dx + dy
 
     def find_path(self):
+        if self.method is not None:
+            return self.__find_path_with_engine()
         self.__setup_start_and_goal()
 
         while self.__is_something_on_the_frontier():
             current = self.__pop()
+            if current is None:
+                break
             if self.__is_goal_state_reached(current.state):
                 return self.__get_the_path()
 
             self.__mark_state_explored(current.state)
+            self.expanded_nodes += 1
 
             neighbors = self.__get_neighbors_of(current.state)
             for neighbor in neighbors:
@@ -53,11 +72,10 @@ class Agent(kuimaze.SearchAgent):
                 self.__assign_costs_to(state, transition_cost, current.state)
 
                 node = self.Node(self.__g_score[state], self.__f_score[state], transition_cost, state)
-                if self.__is_state_unexplored(node.state):
-                    if self.__is_node_worthy_of_exploring(node):
-                        self.__push(node)
-                    self.environment.render()   # show environment's GUI DO NOT FORGET TO COMMENT THIS LINE!
-                    # time.sleep(0.1)             # sleep for demonstration DO NOT FORGET TO COMMENT THIS LINE!
+                if self.__is_state_unexplored(node.state) and self.__is_node_worthy_of_exploring(node):
+                    self.__push(node)
+            if self.render:
+                self.environment.render()   # show environment's GUI, redraws are limited by its frame rate
 
         return None
 
@@ -65,6 +83,14 @@ class Agent(kuimaze.SearchAgent):
 
     # region Helper Functions
 
+    def __find_path_with_engine(self):
+        """ Searches with the search engine of the environment, towards the nearest of all goals """
+        self.environment.reset()
+        engine = self.environment.get_search_engine()
+        path = engine.find_path(method=self.method)
+        self.expanded_nodes = engine.expanded_nodes
+        return path
+
     def __is_goal_state_reached(self, state):
         return state == self.__goal
 
@@ -79,7 +105,7 @@ class Agent(kuimaze.SearchAgent):
             Returns True if node with the same coordinates does not lie on the frontier
             or if the current one has a better cost
         """
-        return len([n for n in self.__frontier_pq if (n.state == node.state and n < node)]) == 0
+        return node.g < self.__frontier_g.get(node.state, self.__MAX_PATH_LEN)
 
     def __get_neighbors_of(self, state):
         return self.environment.expand(state)
@@ -117,13 +143,31 @@ class Agent(kuimaze.SearchAgent):
         self.__explored_set.add(state)
 
     def __pop(self):
-        return heapq.heappop(self.__frontier_pq)
+        """
+            Pops the best node, nodes replaced by a better one or of already explored states are skipped
+            :return: Node or None if there is no valid node on the frontier
+        """
+        while self.__frontier_pq:
+            node = heapq.heappop(self.__frontier_pq)
+            if node.state in self.__explored_set or node.g > self.__frontier_g[node.state]:
+                continue
+            del self.__frontier_g[node.state]
+            return node
+        return None
 
     def __push(self, node):
+        self.__frontier_g[node.state] = node.g
         return heapq.heappush(self.__frontier_pq, node)
 
     def __setup_start_and_goal(self):
         """ Identifies the goal and sets up starting node """
+        self.__frontier_pq = []
+        self.__frontier_g = {}
+        self.__explored_set = set()
+        self.__came_from = {}
+        self.__g_score = {}
+        self.__f_score = {}
+        self.expanded_nodes = 0
         (start, goal) = self.environment.reset()[0:2]
         (s_state, s_transition_cost) = (start[0:2], start[2])
         (g_state, g_transition_cost) = (goal[0:2], goal[2])
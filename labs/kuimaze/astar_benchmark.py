@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+"""
+Measures the speed of the A* agent on the large mazes without any GUI.
+Usage: python astar_benchmark.py [-r repeats] [-m search_method] [map1 map2 ...]
+"""
+import getopt
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+import kuimaze
+from agent import Agent
+
+MAPS = ['maps_difficult/maze100x100.png', 'maps_difficult/maze400x400.png']
+
+
+def run_benchmark(map_image, repeats=1, method=None):
+    """
+    :param map_image: path to the map
+    :param repeats: number of searches, the fastest one is reported
+    :param method: search method of the agent, see Agent
+    :return: dictionary with the path length, number of expanded nodes, duration of the search in seconds
+    and expansions per second
+    """
+    # the maze prints its setup, drop it
+    with redirect_stdout(io.StringIO()):
+        env = kuimaze.InfEasyMaze(map_image=map_image, grad=(0, 0), headless=True)
+    agent = Agent(env, render=False, method=method)
+    best = None
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        path = agent.find_path()
+        duration = time.perf_counter() - start_time
+        if best is None or duration < best:
+            best = duration
+    return {
+        'map': map_image,
+        'path_length': len(path) if path is not None else None,
+        'expanded_nodes': agent.expanded_nodes,
+        'duration_s': best,
+        'expansions_per_s': agent.expanded_nodes / best if best > 0 else float('inf'),
+    }
+
+
+if __name__ == '__main__':
+    (choices, args) = getopt.getopt(sys.argv[1:], "r:m:")
+    options = dict(choices)
+    repeats = int(options.get('-r', 1))
+    method = options.get('-m')
+    maps = args if args else [os.path.join(os.path.dirname(os.path.abspath(__file__)), m) for m in MAPS]
+
+    print('%-40s %8s %10s %10s %12s' % ('map', 'path', 'expanded', 'time s', 'expansions/s'))
+    for map_image in maps:
+        result = run_benchmark(map_image, repeats, method)
+        print('%-40s %8s %10d %10.3f %12.0f' % (os.path.basename(result['map']), result['path_length'],
+                                                result['expanded_nodes'], result['duration_s'],
+                                                result['expansions_per_s']))
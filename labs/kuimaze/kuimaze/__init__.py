@@ -7,11 +7,14 @@ from .maze import ACTION as ACTION
 from .maze import SHOW as SHOW
 from .maze import Maze as Maze
 from .maze import ProbsRoulette as ProbsRoulette
+from .maze import AdjacencyIndex as AdjacencyIndex
 from .gym_wrapper import InfEasyMaze
 from .gym_wrapper import EasyMaze
 from .gym_wrapper import HardMaze
 from .gym_wrapper import InfHardMaze
 from .gym_wrapper import EasyMazeEnv
+from .search import SearchEngine
+from .offscreen import OffscreenRenderer
 
-__all__ = ['Maze', 'SHOW', 'ACTION', 'SearchAgent','BaseAgent', 'ProbsRoulet']
+__all__ = ['Maze', 'SHOW', 'ACTION', 'SearchAgent','BaseAgent', 'ProbsRoulet', 'AdjacencyIndex', 'SearchEngine', 'OffscreenRenderer']
 
@@ -18,12 +18,15 @@ from gym.utils import seeding
 
 import kuimaze
 from .map_generator import maze as mapgen_maze
+from .offscreen import OffscreenRenderer
 
 path_section = collections.namedtuple('Path', ['state_from', 'state_to', 'cost', 'action'])
 state = collections.namedtuple('State', ['x', 'y'])
+# (dx, dy) of the actions 0-3, same order as in kuimaze.Maze.result
+DELTAS = [(0, -1), (1, 0), (0, 1), (-1, 0)]
 
 class MazeEnv(gym.Env):
-    metadata = {'render.modes': ['human']}
+    metadata = {'render.modes': ['human', 'rgb_array']}
     _path = []
     _visited = []
     MAP = '../maps/easy/easy3.bmp'
@@ -59,7 +62,10 @@ class MazeEnv(gym.Env):
         self._gym_compatible = gym_compatible
         self._deter = deter
         self._gui_disabled = True
+        self._force_redraw = False
         self._set = False
+        self._renderer = None
+        self._rendered_visited = 0
         # set action and observation space
         self._xsize = self._problem.get_dimensions()[0]
         self._ysize = self._problem.get_dimensions()[1]
@@ -91,15 +97,59 @@ class MazeEnv(gym.Env):
         if self._gym_compatible:
             self._path.append(self._problem.get_start_state())
         self._visited.append(self._problem.get_start_state())
+        self._rendered_visited = 0
         self._curr_state = self._problem.get_start_state()
+        if self._renderer is not None:
+            self._renderer.clear()
         return self._get_observation()
 
     def render(self, mode='human', close=False):
+        '''
+        @param mode: 'human' - show the GUI, 'rgb_array' - draw offscreen without a display, see
+        L{get_offscreen_renderer}
+        @return: None for 'human', numpy.ndarray of shape (height, width, 3) for 'rgb_array'
+        '''
         assert self._set, "reset() must be called first!"
+        if mode == 'rgb_array':
+            renderer = self.get_offscreen_renderer()
+            renderer.set_visited(self._get_new_visited())
+            renderer.set_explored([self._curr_state])
+            return renderer.render()
         self._gui_disabled = False
-        self._problem.set_visited(self._visited)
+        # visited states are only appended, pass those added since the last render
+        self._problem.set_visited(self._visited[self._rendered_visited:])
+        self._rendered_visited = len(self._visited)
         self._problem.set_explored([self._curr_state])
-        self._problem.show_and_break()
+        # a set path is drawn regardless of the frame rate
+        self._problem.show_and_break(force=self._force_redraw)
+        self._force_redraw = False
+
+    def get_offscreen_renderer(self, cell_size=None):
+        '''
+        Renderer used by render(mode='rgb_array'), created on the first call. Use it to save frames, the path
+        or a field of distances without a display.
+        @param cell_size: size of a cell in pixels, when the renderer is created
+        @return: kuimaze.offscreen.OffscreenRenderer
+        '''
+        if self._renderer is None:
+            self._renderer = OffscreenRenderer(self._problem, cell_size or kuimaze.offscreen.CELL_SIZE)
+            self._rendered_visited = 0
+        return self._renderer
+
+    def _get_new_visited(self):
+        '''
+        @return: states visited since the last offscreen render, visited states are only appended
+        '''
+        visited = self._visited[self._rendered_visited:]
+        self._rendered_visited = len(self._visited)
+        return visited
+
+    def set_frame_rate(self, frame_rate):
+        '''
+        Limits how often render() redraws the GUI, see L{kuimaze.Maze.set_frame_rate}
+        @param frame_rate: maximal number of redraws per second, None for no limit
+        '''
+        self._problem.set_frame_rate(frame_rate)
 
     def close(self):
         self._gui_disabled = True
@@ -232,7 +282,16 @@ class EasyMazeEnv(MazeEnv):
     Unlike the HardMaze, EasyMaze has additional method set_path - which can set different path than agent movement.
     '''
 
-    def __init__(self, informed, map_image_dir=None, grad=(0, 0)):
+    def __init__(self, informed, map_image_dir=None, grad=(0, 0), headless=False):
+        '''
+        @param headless: boolean - T = no GUI, expand uses precomputed adjacency and costs and
+        visited positions are kept in a boolean grid instead of a list
+        '''
+        self._headless = headless
+        self._adjacency = None
+        self._step_costs = None
+        self._visited_grid = None
+        self._search_engine = None
         super(EasyMazeEnv, self).__init__(informed, False, True, map_image_dir, grad)
         self._gui_on = False
 
@@ -240,15 +299,36 @@ class EasyMazeEnv(MazeEnv):
         last_state = self._curr_state
         assert (type(action) == list or type(action) == tuple) and len(action) == 2
         self._curr_state = self._easy_result(action)
-        if self._curr_state not in self._visited:
+        if self._headless:
+            self._visited_grid[self._curr_state.x, self._curr_state.y] = True
+        elif self._curr_state not in self._visited:
             self._visited.append(self._curr_state)
         reward, done = self._get_reward(self._curr_state, last_state)
         return self._get_observation(), reward, done, None
 
+    def reset(self):
+        observation = super(EasyMazeEnv, self).reset()
+        if self._headless:
+            if self._adjacency is None:
+                self._setup_headless()
+            self._visited_grid[:] = False
+            self._visited_grid[self._curr_state.x, self._curr_state.y] = True
+        return observation
+
     def render(self, mode='human', close=False):
+        if mode == 'rgb_array':
+            return super(EasyMazeEnv, self).render(mode, close)
+        if self._headless:
+            return
         super(EasyMazeEnv, self).render(mode, close)
         self._gui_on = True
 
+    def _get_new_visited(self):
+        if self._headless:
+            # the renderer draws only the cells it has not seen yet
+            return self._visited_grid
+        return super(EasyMazeEnv, self)._get_new_visited()
+
     def set_path(self, path):
         '''
         This method sets enviroment to visualize your found path. Method render, must be called afterwards.
@@ -257,6 +337,9 @@ class EasyMazeEnv(MazeEnv):
         '''
         ret = []
         self._path = path
+        if self._renderer is not None:
+            self._renderer.clear_path()
+            self._renderer.show_path(path)
         if self._gui_on:
             assert (type(path[0]) == list or type(path[0]) == tuple) and (len(path[0]) == 2 or len(path[0]) == 3)
             previus_state = None
@@ -269,6 +352,7 @@ class EasyMazeEnv(MazeEnv):
 
             self._player.set_path(ret)
             self._player.find_path()
+            self._force_redraw = True
 
     def _is_available(self, new_state):
         '''
@@ -276,6 +360,12 @@ class EasyMazeEnv(MazeEnv):
         @param new_state:
         @return: boolean
         '''
+        if self._headless:
+            if self._is_inside(new_state) and self._visited_grid[new_state.x, new_state.y]:
+                return True
+            moves = self._adjacency[self._curr_state.x][self._curr_state.y]
+            return any(moves >> k & 1 and (self._curr_state.x + dx, self._curr_state.y + dy) == new_state
+                       for k, (dx, dy) in enumerate(DELTAS))
         tmp = []
         tmp.extend(self._visited)
         tmp.extend([self._problem.result(self._curr_state, 0), self._problem.result(self._curr_state, 1),
@@ -316,6 +406,8 @@ class EasyMazeEnv(MazeEnv):
 
         @return: tuple of coordinates [x, y] with "cost" for movement to these positions: [[[x1, y1], cost1], [[x2, y2], cost2], ... ] 
         '''
+        if self._headless:
+            return self._headless_expand(position)
         expanded_nodes = []
         maze_pose = state(position[0], position[1])
         tmp = [self._problem.result(maze_pose, 0), self._problem.result(maze_pose, 1),
@@ -329,6 +421,61 @@ class EasyMazeEnv(MazeEnv):
             expanded_nodes.append([(new_state.x, new_state.y), reward])
         return expanded_nodes
 
+    def get_visited_grid(self):
+        '''
+        Headless mode only
+        @return: numpy.ndarray of booleans of maze dimensions, True for visited positions
+        '''
+        assert self._headless, "visited grid is kept only in headless mode"
+        return self._visited_grid
+
+    def get_search_engine(self):
+        '''
+        Search engine of the maze towards all its goals, created on the first call and kept, so that its
+        distance field is computed only once
+        @return: kuimaze.SearchEngine
+        '''
+        if self._search_engine is None:
+            self._search_engine = kuimaze.SearchEngine(self._problem)
+        return self._search_engine
+
+    def _setup_headless(self):
+        '''
+        Precomputes which moves are possible from every cell (bit k of self._adjacency[x][y] is set if
+        action k leads to a different cell) and their costs
+        @return: None
+        '''
+        free = self._problem.get_free_cells()
+        adjacency = np.zeros(free.shape, dtype=np.uint8)
+        padded = np.pad(free, 1, mode='constant', constant_values=False)
+        for k, (dx, dy) in enumerate(DELTAS):
+            neighbour_free = padded[1 + dx:1 + dx + free.shape[0], 1 + dy:1 + dy + free.shape[1]]
+            adjacency |= ((free & neighbour_free).astype(np.uint8) << k)
+        # nested lists are much faster to index from python than a numpy array
+        self._adjacency = adjacency.tolist()
+        origin = state(0, 0)
+        self._step_costs = [self._get_cost(origin, state(dx, dy)) for (dx, dy) in DELTAS]
+        self._visited_grid = np.zeros(free.shape, dtype=bool)
+
+    def _headless_expand(self, position):
+        '''
+        Same as expand, without creating states and searching the list of visited positions
+        '''
+        x, y = position[0], position[1]
+        moves = self._adjacency[x][y]
+        visited = self._visited_grid
+        expanded_nodes = []
+        for k in range(4):
+            if moves >> k & 1:
+                dx, dy = DELTAS[k]
+                new_position = (x + dx, y + dy)
+                visited[new_position] = True
+                expanded_nodes.append([new_position, self._step_costs[k]])
+        return expanded_nodes
+
+    def _is_inside(self, position):
+        return 0 <= position.x < self._xsize and 0 <= position.y < self._ysize
+
 
 
 
@@ -359,8 +506,8 @@ class InfEasyMaze(EasyMazeEnv):
     informed easy maze, suitable for A* implementation
     step([x, y])
     '''
-    def __init__(self, map_image=None, grad=(0, 0)):
-        super(InfEasyMaze, self).__init__(True, map_image, grad)
+    def __init__(self, map_image=None, grad=(0, 0), headless=False):
+        super(InfEasyMaze, self).__init__(True, map_image, grad, headless)
 
 
 class EasyMaze(EasyMazeEnv):
@@ -368,8 +515,8 @@ class EasyMaze(EasyMazeEnv):
     uninformed easy maze, suitable for BFS, DFS ...
     step([x, y])
     '''
-    def __init__(self, map_image=None, grad=(0, 0)):
-        super(EasyMaze, self).__init__(False, map_image, grad)
+    def __init__(self, map_image=None, grad=(0, 0), headless=False):
+        super(EasyMaze, self).__init__(False, map_image, grad, headless)
 
 
 class HardMaze(MazeEnv):
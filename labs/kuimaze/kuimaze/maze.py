@@ -13,6 +13,7 @@ import enum
 import numpy as np
 import os
 import random
+import time
 import warnings
 from PIL import Image, ImageTk
 import sys
@@ -42,6 +43,8 @@ MAX_WINDOW_PERCENTAGE = 0.85
 BORDER_SIZE = 20
 #: Percentage of actuall cell size that specifies thickness of line size used in show_path. Line thickness is then determined by C{max(1, int(LINE_SIZE_PERCENTAGE * cell_size))}
 LINE_SIZE_PERCENTAGE = 0.1
+#: Default maximal number of GUI redraws per second, calls of show_and_break above this rate only collect changed cells
+FRAME_RATE = 25
 
 LINE_COLOR = "#FFF555333"
 WALL_COLOR = "#000000000"
@@ -120,6 +123,87 @@ class ProbsRoulette:
         return str(self.probtable)
 
 
+class AdjacencyIndex:
+    '''
+    Compressed sparse row index of the moves between neighbouring cells. Cells are identified by
+    C{cell_id = x * y_size + y}, the moves from a cell are stored in C{neighbours[indptr[cell_id]:indptr[cell_id + 1]]}
+    together with their C{costs} and C{actions} (values of L{ACTION}), in the order of actions. Walls have no moves.
+
+    Moving from C{a} to the neighbour C{b} costs C{1 + (a - b) . grad}, the same as the costs returned by
+    C{EasyMazeEnv.expand}.
+    '''
+
+    def __init__(self, free, deltas, grad):
+        '''
+        @param free: boolean numpy.ndarray of shape (x, y), True for cells without a wall
+        @param deltas: list of (dx, dy) of the moves indexed by action value
+        @param grad: tuple - vector tuning the tilt of maze
+        '''
+        self.shape = free.shape
+        self.grad = tuple(grad)
+        self.free = free.copy()
+        self.free.flags.writeable = False
+        padded = np.pad(free, 1, mode='constant', constant_values=False)
+        # moves[k] is True where the action k leads to a different cell
+        moves = np.empty((len(deltas),) + free.shape, dtype=bool)
+        costs = np.empty(moves.shape, dtype=float)
+        for k, (dx, dy) in enumerate(deltas):
+            moves[k] = free & padded[1 + dx:1 + dx + free.shape[0], 1 + dy:1 + dy + free.shape[1]]
+            # same sequence of operations as EasyMazeEnv._get_cost so that the costs are equal
+            z_axis = -dx * grad[0] + -dy * grad[1]
+            costs[k] = abs(dx) + abs(dy) + z_axis
+        # edges sorted by the cell and then by the action
+        order = np.moveaxis(moves, 0, -1).reshape(free.size, len(deltas))
+        cell_ids, actions = np.nonzero(order)
+        offsets = np.array([dx * free.shape[1] + dy for (dx, dy) in deltas])
+        self.indptr = np.zeros(free.size + 1, dtype=int)
+        np.cumsum(order.sum(axis=1), out=self.indptr[1:])
+        self.neighbours = cell_ids + offsets[actions]
+        self.actions = actions
+        self.costs = np.moveaxis(costs, 0, -1).reshape(free.size, len(deltas))[cell_ids, actions]
+        #: True if all moves cost the same
+        self.uniform = bool(len(self.costs) == 0 or (self.costs == self.costs[0]).all())
+        for array in (self.indptr, self.neighbours, self.actions, self.costs):
+            array.flags.writeable = False
+        self.__lists = None
+
+    def __len__(self):
+        '''
+        @return: number of cells including walls
+        '''
+        return self.shape[0] * self.shape[1]
+
+    def get_cell_id(self, x, y):
+        return x * self.shape[1] + y
+
+    def get_position(self, cell_id):
+        '''
+        @return: coordinates (x, y) of the cell
+        @rtype: tuple
+        '''
+        return divmod(cell_id, self.shape[1])
+
+    def get_moves(self, cell_id):
+        '''
+        Returns the moves from a cell as views into the index, no copy is made
+        @return: tuple of arrays (neighbour cell ids, costs, actions)
+        @rtype: tuple
+        '''
+        start, end = self.indptr[cell_id], self.indptr[cell_id + 1]
+        return self.neighbours[start:end], self.costs[start:end], self.actions[start:end]
+
+    def as_lists(self):
+        '''
+        The index converted into python lists once, iterating lists from python is much faster than numpy arrays:
+        C{for i in range(indptr[cell_id], indptr[cell_id + 1]): neighbours[i], costs[i]}
+        @return: tuple of lists (indptr, neighbours, costs, actions)
+        @rtype: tuple
+        '''
+        if self.__lists is None:
+            self.__lists = (self.indptr.tolist(), self.neighbours.tolist(), self.costs.tolist(), self.actions.tolist())
+        return self.__lists
+
+
 class Maze:
     '''
     Maze class takes care of GUI and interaction functions.
@@ -181,6 +265,13 @@ class Maze:
         self.__running_find = False
         self.__eps_folder = os.getcwd()
         self.__eps_prefix = ""
+        self.__changed_cells = None
+        self.__explored_cells = []
+        self.__color_cache = {}
+        self.__frame_interval = 1 / FRAME_RATE
+        self.__last_frame = None
+        self.__pending_frame = None
+        self.__adjacency = None
 
         assert type(grad) == tuple or type(grad) == list
         assert len(grad) == 2 and -1 < grad[0] < 1 and -1 < grad[1] < 1
@@ -315,6 +406,24 @@ class Maze:
         '''
         return self.__maze.shape
 
+    def get_free_cells(self):
+        '''
+        Returns a mask of cells without a wall
+        @return: boolean array of shape L{get_dimensions()<get_dimensions>}, True for cells without a wall
+        @rtype: numpy.ndarray
+        '''
+        return self.__maze.copy()
+
+    def get_adjacency(self):
+        '''
+        Returns the index of moves between neighbouring cells with their costs, built once on the first call
+        @return: adjacency index
+        @rtype: L{AdjacencyIndex}
+        '''
+        if self.__adjacency is None:
+            self.__adjacency = AdjacencyIndex(self.__maze, self.__deltas, self.__grad)
+        return self.__adjacency
+
     def get_actions(self, current_state):
         '''
         Generate (yield) actions possible for the current_state
@@ -364,24 +473,37 @@ class Maze:
         sets explored states list, preparation for visualisation
         @param states: iterable of L{state<state>}
         '''
-        self.__explored = np.zeros(self.__maze.shape, dtype=bool)
-        for state in states:
-            self.__explored[state.x, state.y] = True
-            if self.__changed_cells is not None:
-                self.__changed_cells.append(state)
+        for cell in self.__explored_cells:
+            self.__explored[cell.x, cell.y] = False
+        if self.__changed_cells is not None:
+            self.__changed_cells.update(self.__explored_cells)
+        self.__explored_cells = [state(s.x, s.y) for s in states]
+        for cell in self.__explored_cells:
+            self.__explored[cell.x, cell.y] = True
+        if self.__changed_cells is not None:
+            self.__changed_cells.update(self.__explored_cells)
 
     def set_probs(self, obey, confusionL, confusionR, confusion180):
         self.__trans_probs.set_probs(obey, confusionL, confusionR, confusion180)
 
     def set_visited(self, states):
         '''
-        sets seen states list, preparation for visualisation
+        sets seen states list, preparation for visualisation, only newly seen states are redrawn
         @param states: iterable of L{state<state>}
         '''
-        for state in states:
-            self.__seen[state.x, state.y] = True
-            if self.__changed_cells is not None:
-                self.__changed_cells.append(state)
+        for s in states:
+            if not self.__seen[s.x, s.y]:
+                self.__seen[s.x, s.y] = True
+                if self.__changed_cells is not None:
+                    self.__changed_cells.add(state(s.x, s.y))
+
+    def set_frame_rate(self, frame_rate):
+        '''
+        Limits how often show_and_break redraws the GUI, cells changed in the meantime are drawn by the next redraw
+        @param frame_rate: maximal number of redraws per second, None for no limit
+        @type frame_rate: float or None
+        '''
+        self.__frame_interval = 1 / frame_rate if frame_rate else 0
 
     def non_det_result(self, action):
         real_action = self.__trans_probs.confuse_action(action)
@@ -416,6 +538,7 @@ class Maze:
         self.__seen[self.__start.x, self.__start.y] = True
         self.__explored = np.zeros(self.__maze.shape, dtype=bool)
         self.__explored[self.__start.x, self.__start.y] = True
+        self.__explored_cells = [self.__start]
         self.__i = 0
         self.__running_find = False
         self.__renew_gui()
@@ -431,6 +554,7 @@ class Maze:
         self.__seen[self.__start.x, self.__start.y] = True
         self.__explored = np.zeros(self.__maze.shape, dtype=bool)
         self.__explored[self.__start.x, self.__start.y] = True
+        self.__explored_cells = [self.__start]
         self.__i = 0
         self.__running_find = False
 
@@ -451,7 +575,7 @@ class Maze:
             self.__gui_root.mainloop()
             '''
 
-    def show_and_break(self, drawed_nodes=None):
+    def show_and_break(self, drawed_nodes=None, force=False):
         '''
         Main GUI function - call this from L{C{BaseAgent.find_path()}<kuimaze.BaseAgent.find_path()>} to update GUI and
         break at this point to be able to step your actions.
@@ -468,11 +592,25 @@ class Maze:
 
         If show_level is L{SHOW.NONE}, this function has no effect
 
+        Redraws are limited by L{set_frame_rate}, a call coming sooner after the previous redraw only keeps
+        the changed cells and schedules a redraw for the end of the frame, unless C{force} is set.
+
         @param drawed_nodes: custom objects convertible to string to draw to center of nodes or True or None
         @type drawed_nodes: list of lists of the same dimensions as problem or boolean or None
+        @param force: redraw regardless of the frame rate
+        @type force: boolean
         '''
         assert (self.__player is not None)
         if self.show_level is not SHOW.NONE:
+            now = time.perf_counter()
+            if not force and self.__gui_setup and self.__last_frame is not None \
+                    and now - self.__last_frame < self.__frame_interval:
+                if self.__pending_frame is None:
+                    delay = int((self.__frame_interval - (now - self.__last_frame)) * 1000) + 1
+                    self.__pending_frame = self.__gui_root.after(delay, self.__flush_frame)
+                return
+            self.__cancel_pending_frame()
+            self.__last_frame = now
             first_run = False
             if not self.__gui_setup:
                 self.__setup_gui()
@@ -488,7 +626,7 @@ class Maze:
                 first_run = False
             if not self.__till_end and self.__running_find:
                 self.__gui_lock = True
-            self.__changed_cells = []
+            self.__changed_cells = set()
             self.__gui_canvas.update()
             '''
             while self.__gui_lock:
@@ -496,6 +634,20 @@ class Maze:
                 self.__gui_root.update()
             '''
 
+    def __flush_frame(self):
+        '''
+        Trailing redraw scheduled by a throttled L{show_and_break}
+        '''
+        self.__pending_frame = None
+        if self.__gui_setup and self.show_level is not SHOW.NONE:
+            self.show_and_break(force=True)
+
+    def __cancel_pending_frame(self):
+        if self.__pending_frame is not None:
+            if self.__gui_root is not None:
+                self.__gui_root.after_cancel(self.__pending_frame)
+            self.__pending_frame = None
+
     def show_path(self, full_path):
         '''
         Show resulting path_section given as a list of consecutive L{namedtuples path_section<path_section>} to show in GUI.
@@ -505,6 +657,8 @@ class Maze:
         @type full_path: list of consecutive L{namedtuples path_section<path_section>}
         '''
         if self.show_level is not SHOW.NONE and len(full_path) is not 0:
+            # draw the cells changed since the last, possibly skipped, redraw under the path
+            self.show_and_break(force=True)
             def coord_gen(paths):
                 paths.append(path_section(paths[-1].state_to, None, None, None))
                 for item in paths:
@@ -518,6 +672,7 @@ class Maze:
                 *coords, width=self.__line_size, capstyle='round', fill=LINE_COLOR, # stipple='gray75',
                 arrow=tkinter.LAST, arrowshape=(size, size, int(size/2.5))), coords))
             self.__text_to_top()
+            self.__gui_canvas.update()
 
     def set_show_level(self, show_level):
         '''
@@ -573,6 +728,7 @@ class Maze:
         self.__gui_canvas = tkinter.Canvas(top_frame, width=width_pixels, height=height_pixels)
         self.__gui_canvas.pack(expand=False, side=tkinter.LEFT)
         self.__color_handles = (-np.ones(self.get_dimensions(), dtype=int)).tolist()
+        self.__cell_colors = [[None] * self.get_dimensions()[1] for _ in range(self.get_dimensions()[0])]
         self.__text_handles = (-np.ones(self.get_dimensions(), dtype=int)).tolist()
         self.__text_handles_four = (-np.ones([self.get_dimensions()[0], self.get_dimensions()[1], 4], dtype=int)).tolist()
         font_size = max(2, int(0.2 * self.__cell_size))
@@ -616,6 +772,7 @@ class Maze:
         '''
         if unblock:
             self.__gui_lock = False
+        self.__cancel_pending_frame()
         if self.__gui_root is not None:
             self.__gui_root.update()
             self.__gui_root.destroy()
@@ -657,14 +814,16 @@ class Maze:
         assert (self.__gui_setup)
         x, y = current_node.x, current_node.y
         if self.__color_handles[x][y] > 0:
-            if self.__gui_canvas.itemcget(self.__color_handles[x][y], "fill") is not color:
+            if self.__cell_colors[x][y] != color:
                 self.__gui_canvas.itemconfigure(self.__color_handles[x][y], fill=color)
+                self.__cell_colors[x][y] = color
         else:
             left = self.__get_cell_center(x) - self.__cell_size / 2
             right = left + self.__cell_size
             up = self.__get_cell_center(y) - self.__cell_size / 2
             down = up + self.__cell_size
             self.__color_handles[x][y] = self.__gui_canvas.create_rectangle(left, up, right, down, fill=color)
+            self.__cell_colors[x][y] = color
 
     def save_as_eps(self, disabled):
         '''
@@ -716,25 +875,20 @@ class Maze:
         for x, y in get_cells():
             n = state(x, y)
             if not self.__maze[x, y]:
-                self.__set_cell_color(n, self.__color_string_depth(WALL_COLOR, x, y))
+                color = WALL_COLOR
+            elif self.__explored[x, y]:
+                color = EXPLORED_COLOR
+            elif self.is_goal_state(n):
+                color = FINISH_COLOR
+            elif n == self.__start:
+                color = START_COLOR
+            elif self.__seen[x, y]:
+                color = SEEN_COLOR
+            elif explored_only:
+                color = WALL_COLOR
             else:
-                if self.is_goal_state(n):
-                    self.__set_cell_color(n, self.__color_string_depth(FINISH_COLOR, x, y))
-                    if self.__explored[x, y]:
-                        self.__set_cell_color(n, self.__color_string_depth(EXPLORED_COLOR, x, y))
-                else:
-                    if self.__explored[x, y]:
-                        self.__set_cell_color(n, self.__color_string_depth(EXPLORED_COLOR, x, y))
-                    else:
-                        if self.__seen[x, y]:
-                            self.__set_cell_color(n, self.__color_string_depth(SEEN_COLOR, x, y))
-                        else:
-                            if explored_only:
-                                self.__set_cell_color(n, self.__color_string_depth(WALL_COLOR, x, y))
-                            else:
-                                self.__set_cell_color(n, self.__color_string_depth(EMPTY_COLOR, x, y))
-                        if n == self.__start:
-                            self.__set_cell_color(n, self.__color_string_depth(START_COLOR, x, y))
+                color = EMPTY_COLOR
+            self.__set_cell_color(n, self.__color_string_depth(color, x, y))
 
     def visualise(self, dictionary):
         '''
@@ -871,8 +1025,11 @@ class Maze:
         :param color: color string in hexadecimal ... for example "#FFF000000" for red
         :param x: index of square
         :param y: index of square
-        :return: new color string
+        :return: new color string, cached per color and square
         '''
+        key = (color, x, y)
+        if key in self.__color_cache:
+            return self.__color_cache[key]
         assert len(color) == 10
         rgb = [int(color[1:4], 16), int(color[4:7], 16), int(color[7:10], 16)]
         tmp = self.__koef * (x * self.__grad[0] + y * self.__grad[1] + self.__offset)
@@ -886,6 +1043,7 @@ class Maze:
             while len(strings[i]) < 3:
                 strings[i] = "0" + strings[i]
         ret = "#" + strings[0] + strings[1] + strings[2]
+        self.__color_cache[key] = ret
         return ret
 
     def __set_grad_data(self):
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Offscreen rendering of a maze into a numpy image, usable without a display. The image is kept between frames and
+only the cells changed since the last frame are drawn again, so following a search costs time proportional to the
+number of changed cells. Frames can be saved as PNG images or collected into an animated GIF.
+'''
+
+import collections.abc
+import os
+import numpy as np
+from PIL import Image
+
+from .maze import WALL_COLOR, EMPTY_COLOR, EXPLORED_COLOR, SEEN_COLOR, START_COLOR, FINISH_COLOR, LINE_COLOR
+
+#: Default size of one cell in pixels
+CELL_SIZE = 8
+#: Colors of the lowest and the highest value of the value overlay
+VALUE_COLORS = ((255, 0, 0), (0, 160, 255))
+
+
+def rgb(color):
+    '''
+    @param color: tkinter color string with 1 to 4 hexadecimal digits per channel, e.g. "#FFF000000"
+    @return: (r, g, b) with 8 bits per channel
+    @rtype: tuple
+    '''
+    digits = (len(color) - 1) // 3
+    scale = 255 / (16 ** digits - 1)
+    return tuple(int(round(int(color[1 + i * digits:1 + (i + 1) * digits], 16) * scale)) for i in range(3))
+
+
+class OffscreenRenderer:
+    '''
+    Draws the same cell colors as the GUI of L{kuimaze.Maze} (without the depth shading), the found path and values
+    of states, e.g. a field of distances, as colors. Rows of the image are the y coordinates of the maze.
+    '''
+
+    # indices into the palette
+    __WALL, __EMPTY, __EXPLORED, __SEEN, __START, __FINISH = range(6)
+
+    def __init__(self, maze, cell_size=CELL_SIZE):
+        '''
+        @param maze: maze to draw
+        @type maze: L{kuimaze.Maze}
+        @param cell_size: size of one cell in pixels
+        '''
+        self.cell_size = cell_size
+        self.__palette = np.array([rgb(c) for c in (WALL_COLOR, EMPTY_COLOR, EXPLORED_COLOR, SEEN_COLOR,
+                                                    START_COLOR, FINISH_COLOR)], dtype=np.uint8)
+        self.__free = maze.get_free_cells()
+        self.__shape = self.__free.shape
+        self.__start = maze.get_start_state()
+        self.__goal = np.zeros(self.__shape, dtype=bool)
+        for goal in maze.get_goal_nodes():
+            self.__goal[goal.x, goal.y] = True
+        self.__image = np.zeros((self.__shape[1] * cell_size, self.__shape[0] * cell_size, 3), dtype=np.uint8)
+        # overlay of the path, drawn over the cell colors where the mask is set
+        self.__overlay = np.zeros_like(self.__image)
+        self.__overlay_mask = np.zeros(self.__image.shape[:2], dtype=bool)
+        self.__value_colors = None
+        self.__frames = []
+        self.clear()
+
+    # region API Functions
+
+    def clear(self):
+        '''
+        Forgets seen and explored states, the path and the overlays
+        '''
+        self.__seen = np.zeros(self.__shape, dtype=bool)
+        self.__seen[self.__start.x, self.__start.y] = True
+        self.__explored = np.zeros(self.__shape, dtype=bool)
+        self.__explored[self.__start.x, self.__start.y] = True
+        self.__explored_cells = [(self.__start.x, self.__start.y)]
+        self.__overlay_mask[:] = False
+        self.__value_colors = None
+        self.__dirty = []
+        self.__mark_dirty(np.ones(self.__shape, dtype=bool))
+
+    def set_visited(self, states):
+        '''
+        Marks states as seen, same as L{kuimaze.Maze.set_visited}
+        @param states: iterable of L{state<kuimaze.maze.state>} or boolean numpy.ndarray of the shape of the maze
+        '''
+        if isinstance(states, np.ndarray) and states.dtype == bool:
+            xs, ys = np.nonzero(states & ~self.__seen)
+        else:
+            xs, ys = self.__to_cells(states)
+        new = ~self.__seen[xs, ys]
+        self.__seen[xs, ys] = True
+        self.__dirty.append((xs[new], ys[new]))
+
+    def set_explored(self, states):
+        '''
+        Replaces explored states, same as L{kuimaze.Maze.set_explored}
+        @param states: iterable of L{state<kuimaze.maze.state>}
+        '''
+        xs, ys = self.__to_cells(self.__explored_cells)
+        self.__explored[xs, ys] = False
+        self.__dirty.append((xs, ys))
+        self.__explored_cells = [(s[0], s[1]) for s in states]
+        xs, ys = self.__to_cells(self.__explored_cells)
+        self.__explored[xs, ys] = True
+        self.__dirty.append((xs, ys))
+
+    def show_path(self, path):
+        '''
+        Draws a path over the cells
+        @param path: list of states (or (x, y) tuples) of consecutive cells
+        '''
+        path = [(s[0], s[1]) for s in path]
+        width = max(1, int(round(self.cell_size * 0.2)))
+        half = self.cell_size // 2
+        for (x1, y1), (x2, y2) in zip(path, path[1:]):
+            left, right = sorted((x1, x2))
+            top, bottom = sorted((y1, y2))
+            columns = slice(left * self.cell_size + half - width // 2, right * self.cell_size + half + (width + 1) // 2)
+            rows = slice(top * self.cell_size + half - width // 2, bottom * self.cell_size + half + (width + 1) // 2)
+            self.__overlay[rows, columns] = rgb(LINE_COLOR)
+            self.__overlay_mask[rows, columns] = True
+            self.__mark_dirty(slice(left, right + 1), slice(top, bottom + 1))
+
+    def clear_path(self):
+        '''
+        Removes the path
+        '''
+        self.__mark_dirty(self.__overlay_mask.reshape(self.__shape[1], self.cell_size, self.__shape[0],
+                                                      self.cell_size).any(axis=(1, 3)).T)
+        self.__overlay_mask[:] = False
+
+    def show_values(self, values):
+        '''
+        Colors free cells by their values, from the first of L{VALUE_COLORS} for the lowest to the second for the
+        highest value
+        @param values: mapping {(x, y): value} or numpy.ndarray of the shape of the maze, e.g. the distances of
+        L{kuimaze.SearchEngine}, infinite and NaN values are not colored, None removes the values
+        '''
+        if values is None:
+            self.__value_colors = None
+            self.__mark_dirty(self.__free)
+            return
+        grid = self.__to_grid(values, np.nan, float)
+        grid = np.where(np.isinf(grid), np.nan, grid)
+        low, high = np.nanmin(grid), np.nanmax(grid)
+        ratio = (grid - low) / (high - low) if high > low else np.zeros(self.__shape)
+        colors = np.array(VALUE_COLORS, dtype=float)
+        value_colors = (colors[0] + ratio[:, :, np.newaxis] * (colors[1] - colors[0]))
+        defined = ~np.isnan(grid)
+        if self.__value_colors is None:
+            self.__value_colors = np.full(self.__shape + (3,), -1, dtype=int)
+        new_colors = np.where(defined[:, :, np.newaxis], np.round(value_colors), -1).astype(int)
+        self.__mark_dirty((new_colors != self.__value_colors).any(axis=2))
+        self.__value_colors = new_colors
+
+    def render(self):
+        '''
+        Draws the changed cells
+        @return: image of shape (height, width, 3), it is updated in place by the next render, copy it to keep it
+        @rtype: numpy.ndarray
+        '''
+        xs, ys = self.__pop_dirty()
+        if len(xs):
+            colors = self.__palette[self.__get_color_indices(xs, ys)]
+            if self.__value_colors is not None:
+                values = self.__value_colors[xs, ys]
+                use_value = (values[:, 0] >= 0) & self.__free[xs, ys] & ~self.__goal[xs, ys]
+                colors[use_value] = values[use_value]
+            cs = self.cell_size
+            # view of the image as (y, row in cell, x, column in cell, channel)
+            cells = self.__image.reshape(self.__shape[1], cs, self.__shape[0], cs, 3)
+            mask = self.__overlay_mask.reshape(self.__shape[1], cs, self.__shape[0], cs)
+            overlay = self.__overlay.reshape(self.__shape[1], cs, self.__shape[0], cs, 3)
+            blocks = np.broadcast_to(colors[:, np.newaxis, np.newaxis, :], (len(xs), cs, cs, 3)).copy()
+            masked = mask[ys, :, xs, :]
+            blocks[masked] = overlay[ys, :, xs, :][masked]
+            cells[ys, :, xs, :] = blocks
+        return self.__image
+
+    def add_frame(self):
+        '''
+        Renders and keeps a copy of the image as a frame of an animation
+        '''
+        self.__frames.append(self.render().copy())
+
+    def get_frames(self):
+        return self.__frames
+
+    def save_png(self, filename):
+        '''
+        Renders and saves the image
+        @param filename: name of the PNG file
+        '''
+        Image.fromarray(self.render()).save(filename)
+
+    def save_frames(self, folder, prefix='frame'):
+        '''
+        Saves the frames collected by L{add_frame} as numbered PNG images
+        @return: list of the file names
+        '''
+        os.makedirs(folder, exist_ok=True)
+        filenames = []
+        for i, frame in enumerate(self.__frames):
+            filenames.append(os.path.join(folder, '{}{:05d}.png'.format(prefix, i)))
+            Image.fromarray(frame).save(filenames[-1])
+        return filenames
+
+    def save_gif(self, filename, duration=50, loop=0):
+        '''
+        Saves the frames collected by L{add_frame} as an animated GIF
+        @param duration: time of one frame in milliseconds
+        @param loop: number of loops, 0 for infinite
+        '''
+        assert len(self.__frames) > 0, "add_frame() must be called before save_gif"
+        images = [Image.fromarray(frame) for frame in self.__frames]
+        images[0].save(filename, save_all=True, append_images=images[1:], duration=duration, loop=loop)
+
+    def clear_frames(self):
+        self.__frames = []
+
+    # endregion
+
+    # region Helper Functions
+
+    def __get_color_indices(self, xs, ys):
+        '''
+        Same priorities as in the GUI of L{kuimaze.Maze}
+        @return: palette index of every given cell
+        '''
+        free = self.__free[xs, ys]
+        explored = self.__explored[xs, ys]
+        indices = np.where(self.__seen[xs, ys], self.__SEEN, self.__EMPTY)
+        indices[(xs == self.__start.x) & (ys == self.__start.y)] = self.__START
+        indices[explored] = self.__EXPLORED
+        indices[self.__goal[xs, ys] & ~explored] = self.__FINISH
+        indices[~free] = self.__WALL
+        return indices
+
+    def __mark_dirty(self, *cells):
+        '''
+        @param cells: boolean mask of the shape of the maze, or index (x, y) - integers or slices - of the cells
+        '''
+        if len(cells) == 1:
+            self.__dirty.append(np.nonzero(cells[0]))
+        else:
+            xs, ys = np.mgrid[cells[0], cells[1]] if isinstance(cells[0], slice) else (np.array(cells[0]),
+                                                                                       np.array(cells[1]))
+            self.__dirty.append((xs.ravel(), ys.ravel()))
+
+    def __pop_dirty(self):
+        '''
+        @return: unique coordinates (xs, ys) of the cells changed since the last call
+        '''
+        if not self.__dirty:
+            return np.empty(0, dtype=int), np.empty(0, dtype=int)
+        xs = np.concatenate([np.asarray(c[0], dtype=int).ravel() for c in self.__dirty])
+        ys = np.concatenate([np.asarray(c[1], dtype=int).ravel() for c in self.__dirty])
+        self.__dirty = []
+        cells = np.unique(xs * self.__shape[1] + ys)
+        return cells // self.__shape[1], cells % self.__shape[1]
+
+    @staticmethod
+    def __to_cells(states):
+        states = list(states)
+        return (np.fromiter((s[0] for s in states), dtype=int, count=len(states)),
+                np.fromiter((s[1] for s in states), dtype=int, count=len(states)))
+
+    def __to_grid(self, values, fill, dtype):
+        if isinstance(values, collections.abc.Mapping):
+            grid = np.full(self.__shape, fill, dtype=dtype)
+            for (x, y), value in values.items():
+                if value is not None:
+                    grid[x, y] = value
+            return grid
+        grid = np.asarray(values, dtype=dtype)
+        assert grid.shape == self.__shape, "ERROR: Values must have the same shape as the maze!"
+        return grid
+
+    # endregion
@@ -0,0 +1,440 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Shortest path search on the L{AdjacencyIndex<kuimaze.maze.AdjacencyIndex>} of a maze: A* towards the nearest
+of several goals, bidirectional A*, Jump Point Search and a precomputed field of distances to the goals.
+All methods return the path as a list of positions [(x1, y1), (x2, y2), ... ] accepted by C{EasyMazeEnv.set_path}.
+'''
+
+import heapq
+import itertools
+import numpy as np
+
+
+class SearchEngine:
+    '''
+    Finds the cheapest path from a start to the nearest goal. The costs of moves are those of C{EasyMazeEnv.expand}.
+    Since the gradient part of the costs telescopes along a path, C{|v - t|_1 + (v - t) . grad} is a consistent
+    heuristic, with several goals the minimum over goals is used.
+    '''
+
+    def __init__(self, maze, start=None, goals=None):
+        '''
+        @param maze: maze to search in
+        @type maze: L{kuimaze.Maze}
+        @param start: start position (x, y), start state of the maze if None
+        @param goals: iterable of goal positions (x, y), goal states of the maze if None
+        '''
+        self.__adjacency = maze.get_adjacency()
+        self.__grad = self.__adjacency.grad
+        self.__indptr, self.__neighbours, self.__costs, _ = self.__adjacency.as_lists()
+        self.__reversed = None
+        self.__distance_field = None
+        self.__next_cell = None
+        self.__free = None
+        if start is None:
+            start = maze.get_start_state()
+        if goals is None:
+            goals = maze.get_goal_nodes()
+        self.start = (start[0], start[1])
+        self.goals = [(goal[0], goal[1]) for goal in goals]
+        assert len(self.goals) > 0
+        # number of nodes expanded by the last search
+        self.expanded_nodes = 0
+
+    # region API Functions
+
+    def find_path(self, start=None, method='astar'):
+        '''
+        @param start: start position (x, y), start given in constructor if None
+        @param method: 'astar' - A* to the nearest goal, 'bidirectional' - bidirectional A*,
+        'jps' - Jump Point Search (A* if the costs are not uniform), 'field' - descent along the precomputed
+        distance field
+        @return: list of positions [(x1, y1), (x2, y2), ... ] from the start to a goal, None if no goal is reachable
+        '''
+        if start is None:
+            start = self.start
+        if method == 'astar':
+            return self.astar(start)
+        if method == 'bidirectional':
+            return self.bidirectional_astar(start)
+        if method == 'jps':
+            return self.jump_point_search(start)
+        if method == 'field':
+            return self.get_path_from_field(start)
+        raise ValueError('Unknown search method: {}'.format(method))
+
+    def heuristic_function(self, position):
+        '''
+        @param position: position (x, y)
+        @return: lower bound of the cost from the position to the nearest goal
+        '''
+        x, y = position
+        gx, gy = self.__grad
+        return min(abs(x - tx) + abs(y - ty) + (x - tx) * gx + (y - ty) * gy for (tx, ty) in self.goals)
+
+    def astar(self, start):
+        '''
+        A* towards all goals at once, the first goal popped from the frontier is the nearest one
+        @param start: start position (x, y)
+        @return: list of positions from the start to the nearest goal, None if no goal is reachable
+        '''
+        adjacency = self.__adjacency
+        indptr, neighbours, costs = self.__indptr, self.__neighbours, self.__costs
+        goal_ids = set(adjacency.get_cell_id(x, y) for (x, y) in self.goals)
+        start_id = adjacency.get_cell_id(*start)
+        heuristic = self.__get_heuristic(self.goals)
+
+        g_score = {start_id: 0}
+        came_from = {}
+        explored = set()
+        counter = itertools.count()
+        frontier = [(heuristic(start_id), next(counter), start_id)]
+        self.expanded_nodes = 0
+        while frontier:
+            _, _, current = heapq.heappop(frontier)
+            if current in explored:
+                continue
+            if current in goal_ids:
+                return self.__get_path(came_from, current)
+            explored.add(current)
+            self.expanded_nodes += 1
+            g = g_score[current]
+            for i in range(indptr[current], indptr[current + 1]):
+                neighbour = neighbours[i]
+                g_new = g + costs[i]
+                if neighbour not in explored and g_new < g_score.get(neighbour, float('inf')):
+                    g_score[neighbour] = g_new
+                    came_from[neighbour] = current
+                    heapq.heappush(frontier, (g_new + heuristic(neighbour), next(counter), neighbour))
+        return None
+
+    def bidirectional_astar(self, start):
+        '''
+        Bidirectional A* with the average of the forward and backward heuristics as potentials (Ikeda et al.),
+        the backward search starts from all goals. Terminates when the sum of the smallest keys of both
+        frontiers reaches the cost of the best path found.
+        @param start: start position (x, y)
+        @return: list of positions from the start to the nearest goal, None if no goal is reachable
+        '''
+        adjacency = self.__adjacency
+        start_id = adjacency.get_cell_id(*start)
+        goal_ids = [adjacency.get_cell_id(x, y) for (x, y) in self.goals]
+        to_goal = self.__get_heuristic(self.goals)
+        to_start = self.__get_heuristic([start], backward=True)
+
+        def forward_potential(cell_id):
+            return (to_goal(cell_id) - to_start(cell_id)) / 2
+
+        def backward_potential(cell_id):
+            return -forward_potential(cell_id)
+
+        forward = self.__BidirectionalSearch(self.__indptr, self.__neighbours, self.__costs, [start_id],
+                                             forward_potential)
+        backward = self.__BidirectionalSearch(*self.__get_reversed(), goal_ids, backward_potential)
+        best_cost = float('inf')
+        meeting = None
+        if start_id in backward.g_score:
+            best_cost = 0.0
+            meeting = start_id
+        self.expanded_nodes = 0
+        while forward.frontier and backward.frontier:
+            if forward.get_top_key() + backward.get_top_key() >= best_cost:
+                break
+            search, other = (forward, backward) if len(forward.frontier) <= len(backward.frontier) \
+                else (backward, forward)
+            current = search.pop()
+            if current is None:
+                continue
+            self.expanded_nodes += 1
+            for neighbour in search.expand(current):
+                if neighbour in other.g_score:
+                    cost = search.g_score[neighbour] + other.g_score[neighbour]
+                    if cost < best_cost:
+                        best_cost = cost
+                        meeting = neighbour
+        if meeting is None:
+            return None
+        path = self.__get_path(forward.came_from, meeting)
+        current = meeting
+        while current in backward.came_from:
+            current = backward.came_from[current]
+            path.append(adjacency.get_position(current))
+        return path
+
+    def jump_point_search(self, start):
+        '''
+        Jump Point Search for the 4-connected grid with the horizontal-first canonical ordering: after a horizontal
+        move both vertical directions are natural successors, after a vertical move only the same direction and
+        the forced horizontal neighbours (the cell behind them is blocked). Only jump points are pushed to the
+        frontier, straight segments between them are filled in afterwards.
+        Requires all moves to have the same cost, falls back to L{astar} when the gradient makes the costs
+        non-uniform.
+        @param start: start position (x, y)
+        @return: list of positions from the start to the nearest goal, None if no goal is reachable
+        '''
+        adjacency = self.__adjacency
+        if not adjacency.uniform:
+            return self.astar(start)
+        step_cost = adjacency.costs[0] if len(adjacency.costs) else 1
+        if self.__free is None:
+            # padded by walls so that jumps do not need bound checks
+            self.__free = np.pad(adjacency.free, 1, mode='constant', constant_values=False).tolist()
+        goals = set(self.goals)
+        heuristic = self.__get_heuristic(self.goals)
+        y_size = adjacency.shape[1]
+
+        start = (start[0], start[1])
+        g_score = {start: 0}
+        came_from = {}
+        explored = set()
+        counter = itertools.count()
+        # frontier items are (f, tie, position, direction of the move into the position)
+        frontier = [(heuristic(start[0] * y_size + start[1]), next(counter), start, None)]
+        self.expanded_nodes = 0
+        while frontier:
+            _, _, current, direction = heapq.heappop(frontier)
+            if current in explored:
+                continue
+            if current in goals:
+                return self.__get_jps_path(came_from, current)
+            explored.add(current)
+            self.expanded_nodes += 1
+            g = g_score[current]
+            for (dx, dy) in self.__get_jps_directions(current, direction):
+                jump_point = self.__jump(current, dx, dy, goals)
+                if jump_point is None or jump_point in explored:
+                    continue
+                g_new = g + step_cost * (abs(jump_point[0] - current[0]) + abs(jump_point[1] - current[1]))
+                if g_new < g_score.get(jump_point, float('inf')):
+                    g_score[jump_point] = g_new
+                    came_from[jump_point] = current
+                    f = g_new + heuristic(jump_point[0] * y_size + jump_point[1])
+                    heapq.heappush(frontier, (f, next(counter), jump_point, (dx, dy)))
+        return None
+
+    def compute_distance_field(self):
+        '''
+        Computes cost of the cheapest path to the nearest goal for every cell by Dijkstra's algorithm
+        running backwards from all goals. The field is computed once and reused by L{get_path_from_field}.
+        @return: numpy.ndarray of shape of the maze, inf for walls and cells from which no goal is reachable
+        '''
+        if self.__distance_field is not None:
+            return self.__distance_field
+        adjacency = self.__adjacency
+        indptr, predecessors, costs = self.__get_reversed()
+        distance = [float('inf')] * len(adjacency)
+        # the cell to move to from a given cell along the cheapest path
+        next_cell = [-1] * len(adjacency)
+        frontier = []
+        for (x, y) in self.goals:
+            goal_id = adjacency.get_cell_id(x, y)
+            distance[goal_id] = 0.0
+            frontier.append((0.0, goal_id))
+        heapq.heapify(frontier)
+        while frontier:
+            d, current = heapq.heappop(frontier)
+            if d > distance[current]:
+                continue
+            for i in range(indptr[current], indptr[current + 1]):
+                predecessor = predecessors[i]
+                d_new = d + costs[i]
+                if d_new < distance[predecessor]:
+                    distance[predecessor] = d_new
+                    next_cell[predecessor] = current
+                    heapq.heappush(frontier, (d_new, predecessor))
+        self.__next_cell = next_cell
+        self.__distance_field = np.array(distance).reshape(adjacency.shape)
+        return self.__distance_field
+
+    def get_path_from_field(self, start):
+        '''
+        Follows the distance field computed by L{compute_distance_field} (computed on the first call),
+        every query takes time proportional to the length of the path
+        @param start: start position (x, y)
+        @return: list of positions from the start to the nearest goal, None if no goal is reachable
+        '''
+        distance = self.compute_distance_field()
+        if np.isinf(distance[start[0], start[1]]):
+            return None
+        adjacency = self.__adjacency
+        current = adjacency.get_cell_id(*start)
+        path = [(start[0], start[1])]
+        while self.__next_cell[current] >= 0:
+            current = self.__next_cell[current]
+            path.append(adjacency.get_position(current))
+        return path
+
+    def get_path_cost(self, path):
+        '''
+        @param path: list of neighbouring positions
+        @return: sum of costs of the moves along the path
+        '''
+        adjacency = self.__adjacency
+        total = 0
+        for (a, b) in zip(path, path[1:]):
+            a_id, b_id = adjacency.get_cell_id(*a), adjacency.get_cell_id(*b)
+            for i in range(self.__indptr[a_id], self.__indptr[a_id + 1]):
+                if self.__neighbours[i] == b_id:
+                    total += self.__costs[i]
+                    break
+            else:
+                raise ValueError('{} and {} are not neighbours'.format(a, b))
+        return total
+
+    # endregion
+
+    # region Helper Functions
+
+    def __get_heuristic(self, targets, backward=False):
+        '''
+        @param targets: list of positions (x, y)
+        @param backward: if True, the bound of the cost from the nearest target to the cell, otherwise from the cell
+        @return: function of a cell id returning the lower bound of the cost
+        '''
+        y_size = self.__adjacency.shape[1]
+        gx, gy = self.__grad
+        sign = -1 if backward else 1
+
+        def heuristic(cell_id):
+            x, y = divmod(cell_id, y_size)
+            return min(abs(x - tx) + abs(y - ty) + sign * ((x - tx) * gx + (y - ty) * gy) for (tx, ty) in targets)
+        return heuristic
+
+    def __get_reversed(self):
+        '''
+        @return: tuple of lists (indptr, predecessors, costs) - for every cell the cells with a move into it
+        and the costs of these moves
+        '''
+        if self.__reversed is None:
+            adjacency = self.__adjacency
+            sources = np.repeat(np.arange(len(adjacency)), np.diff(adjacency.indptr))
+            order = np.argsort(adjacency.neighbours, kind='stable')
+            indptr = np.zeros(len(adjacency) + 1, dtype=int)
+            np.cumsum(np.bincount(adjacency.neighbours, minlength=len(adjacency)), out=indptr[1:])
+            self.__reversed = (indptr.tolist(), sources[order].tolist(), adjacency.costs[order].tolist())
+        return self.__reversed
+
+    def __is_free(self, x, y):
+        return self.__free[x + 1][y + 1]
+
+    def __get_jps_directions(self, position, direction):
+        '''
+        @param position: position (x, y) of the expanded node
+        @param direction: (dx, dy) of the move into the node, None for the start
+        @return: list of directions (dx, dy) of the pruned successors
+        '''
+        if direction is None:
+            return [(0, -1), (1, 0), (0, 1), (-1, 0)]
+        dx, dy = direction
+        if dy == 0:
+            return [direction, (0, -1), (0, 1)]
+        x, y = position
+        directions = [direction]
+        for side in (-1, 1):
+            if self.__is_free(x + side, y) and not self.__is_free(x + side, y - dy):
+                directions.append((side, 0))
+        return directions
+
+    def __jump(self, position, dx, dy, goals):
+        '''
+        Moves from the position in the direction until it reaches a jump point
+        @return: the jump point (x, y) or None if the move ends in a wall
+        '''
+        x, y = position
+        is_free = self.__is_free
+        while True:
+            x += dx
+            y += dy
+            if not is_free(x, y):
+                return None
+            if (x, y) in goals:
+                return x, y
+            if dy == 0:
+                # both vertical moves are natural successors of a horizontal move
+                if self.__jump((x, y), 0, -1, goals) is not None or self.__jump((x, y), 0, 1, goals) is not None:
+                    return x, y
+            else:
+                for side in (-1, 1):
+                    if is_free(x + side, y) and not is_free(x + side, y - dy):
+                        return x, y
+
+    def __get_jps_path(self, came_from, current):
+        '''
+        Fills in the straight segments between the jump points
+        '''
+        jump_points = [current]
+        while current in came_from:
+            current = came_from[current]
+            jump_points.append(current)
+        jump_points.reverse()
+        path = [jump_points[0]]
+        for (x, y) in jump_points[1:]:
+            px, py = path[-1]
+            dx = (x > px) - (x < px)
+            dy = (y > py) - (y < py)
+            while (px, py) != (x, y):
+                px += dx
+                py += dy
+                path.append((px, py))
+        return path
+
+    def __get_path(self, came_from, current):
+        path = [self.__adjacency.get_position(current)]
+        while current in came_from:
+            current = came_from[current]
+            path.append(self.__adjacency.get_position(current))
+        path.reverse()
+        return path
+
+    # endregion
+
+    # region BidirectionalSearch - Inner Class
+
+    class __BidirectionalSearch:
+        '''
+        One direction of the bidirectional search, lazy-deletion heap keyed by g + potential
+        '''
+
+        def __init__(self, indptr, neighbours, costs, sources, potential):
+            self.indptr = indptr
+            self.neighbours = neighbours
+            self.costs = costs
+            self.potential = potential
+            self.g_score = dict((source, 0.0) for source in sources)
+            self.came_from = {}
+            self.explored = set()
+            self.counter = itertools.count()
+            self.frontier = [(potential(source), next(self.counter), source) for source in sources]
+            heapq.heapify(self.frontier)
+
+        def get_top_key(self):
+            while self.frontier and self.frontier[0][2] in self.explored:
+                heapq.heappop(self.frontier)
+            return self.frontier[0][0] if self.frontier else float('inf')
+
+        def pop(self):
+            _, _, current = heapq.heappop(self.frontier)
+            if current in self.explored:
+                return None
+            self.explored.add(current)
+            return current
+
+        def expand(self, current):
+            '''
+            @return: list of cells whose g score was improved
+            '''
+            improved = []
+            g = self.g_score[current]
+            for i in range(self.indptr[current], self.indptr[current + 1]):
+                neighbour = self.neighbours[i]
+                g_new = g + self.costs[i]
+                if neighbour not in self.explored and g_new < self.g_score.get(neighbour, float('inf')):
+                    self.g_score[neighbour] = g_new
+                    self.came_from[neighbour] = current
+                    heapq.heappush(self.frontier, (g_new + self.potential(neighbour), next(self.counter), neighbour))
+                    improved.append(neighbour)
+            return improved
+
+    # endregion
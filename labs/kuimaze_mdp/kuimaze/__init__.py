@@ -6,14 +6,20 @@ from .baseagent import BaseAgent
 from .maze import ACTION as ACTION
 from .maze import SHOW as SHOW
 from .maze import Maze as Maze
-# from .maze import ActionProbsTable
+from .maze import ActionProbsTable as ActionProbsTable
 from .maze import ProbsRoulette as ProbsRoulette
+from .maze import TransitionModel as TransitionModel
+from .maze import AdjacencyIndex as AdjacencyIndex
+from .grids import UtilityGrid, PolicyGrid
 from .gym_wrapper import InfEasyMaze
 from .gym_wrapper import EasyMaze
 from .gym_wrapper import MDPMaze
 from .gym_wrapper import HardMaze
 from .gym_wrapper import InfHardMaze
+from .gym_wrapper import VectorHardMaze
 from .gym_wrapper import EasyMazeEnv
+from .search import SearchEngine
+from .offscreen import OffscreenRenderer
 
-__all__ = ['Maze', 'SHOW', 'ACTION', 'SearchAgent','BaseAgent', 'ProbsRoulet']
+__all__ = ['Maze', 'SHOW', 'ACTION', 'SearchAgent','BaseAgent', 'ProbsRoulet', 'ActionProbsTable', 'TransitionModel', 'AdjacencyIndex', 'UtilityGrid', 'PolicyGrid', 'SearchEngine', 'OffscreenRenderer']
 
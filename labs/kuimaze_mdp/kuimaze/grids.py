@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Utilities and policies of MDP states stored in numpy arrays indexed by state number, see L{kuimaze.TransitionModel}.
+Both types are also mappings keyed by C{(x, y)} of the free cells, so they can be used wherever a dictionary
+of utilities or a policy dictionary was expected, e.g. in C{env.visualise}.
+'''
+
+import collections.abc
+import numpy as np
+
+from .maze import ACTION
+
+#: Action code of states without an action (terminal states), see L{PolicyGrid}
+NO_ACTION = -1
+
+
+class StateGrid(collections.abc.MutableMapping):
+    '''
+    Base class of the grids. Keys are C{(x, y)} of the free cells in the order of state numbers, walls are not keys
+    and cells can be neither added nor removed.
+    '''
+
+    def __init__(self, model, array):
+        '''
+        @param model: model whose state numbering is used, only C{xs}, C{ys} and C{index} are needed
+        @type model: L{kuimaze.TransitionModel}
+        @param array: numpy.ndarray with one item per state
+        '''
+        assert len(array) == len(model.xs)
+        self.model = model
+        self.array = array
+
+    def _get_state_index(self, key):
+        x, y = key
+        if 0 <= x < self.model.index.shape[0] and 0 <= y < self.model.index.shape[1]:
+            i = self.model.index[x, y]
+            if i >= 0:
+                return i
+        raise KeyError(key)
+
+    def __getitem__(self, key):
+        return self._to_value(self.array[self._get_state_index(key)])
+
+    def __setitem__(self, key, value):
+        self.array[self._get_state_index(key)] = self._from_value(value)
+
+    def __delitem__(self, key):
+        raise TypeError('cells cannot be removed from %s' % type(self).__name__)
+
+    def __iter__(self):
+        return zip(self.model.xs.tolist(), self.model.ys.tolist())
+
+    def __len__(self):
+        return len(self.array)
+
+    def __contains__(self, key):
+        try:
+            self._get_state_index(key)
+        except (KeyError, TypeError, ValueError):
+            return False
+        return True
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, dict(self.items()))
+
+    def copy(self):
+        return type(self)(self.model, self.array.copy())
+
+    def _to_value(self, item):
+        return item
+
+    def _from_value(self, value):
+        return value
+
+
+class UtilityGrid(StateGrid):
+    '''
+    Utilities of states, float64 values
+    '''
+
+    def __init__(self, model, values=None):
+        '''
+        @param model: model whose state numbering is used
+        @type model: L{kuimaze.TransitionModel}
+        @param values: utilities indexed by state number, zeros if None
+        '''
+        if values is None:
+            array = np.zeros(len(model.xs))
+        else:
+            array = np.array(values, dtype=np.float64)
+        super().__init__(model, array)
+
+    def _to_value(self, item):
+        return float(item)
+
+
+class PolicyGrid(StateGrid):
+    '''
+    Actions of states, int8 values of L{ACTION}, L{NO_ACTION} is mapped to None
+    '''
+
+    def __init__(self, model, codes=None):
+        '''
+        @param model: model whose state numbering is used
+        @type model: L{kuimaze.TransitionModel}
+        @param codes: action codes indexed by state number, L{NO_ACTION} everywhere if None
+        '''
+        if codes is None:
+            array = np.full(len(model.xs), NO_ACTION, dtype=np.int8)
+        else:
+            array = np.array(codes, dtype=np.int8)
+        super().__init__(model, array)
+
+    def _to_value(self, item):
+        return None if item == NO_ACTION else ACTION(int(item))
+
+    def _from_value(self, value):
+        return NO_ACTION if value is None else ACTION(value).value
@@ -18,12 +18,25 @@ from gym.utils import seeding
 
 import kuimaze
 from .map_generator import maze as mapgen_maze
+from .offscreen import OffscreenRenderer
 
 path_section = collections.namedtuple('Path', ['state_from', 'state_to', 'cost', 'action'])
 state = collections.namedtuple('State', ['x', 'y'])
 
+
+def generate_map():
+    '''
+    If there is no map in parameter, it will be generated, with following setup
+    '''
+    x_size = 6
+    y_size = 6                                 # not 100% accurate size, could have smaller dimensions
+    complexity = 0.1                            # in interval (0, 1]
+    density = 0.25                              # in interval [0, 1]
+    return mapgen_maze(x_size, y_size, complexity, density)
+
+
 class MazeEnv(gym.Env):
-    metadata = {'render.modes': ['human']}
+    metadata = {'render.modes': ['human', 'rgb_array']}
     _path = []
     _visited = []
     MAP = '../maps/easy/easy3.bmp'
@@ -38,14 +51,7 @@ class MazeEnv(gym.Env):
         @param grad: tuple - vector tuning the tilt of maze`
         '''
         if map_image_dir is None:
-            '''
-            If there is no map in parameter, it will be generated, with following setup
-            '''
-            x_size = 6
-            y_size = 6                                 # not 100% accurate size, could have smaller dimensions
-            complexity = 0.1                            # in interval (0, 1]
-            density = 0.25                              # in interval [0, 1]
-            self.MAP = mapgen_maze(x_size, y_size, complexity, density)
+            self.MAP = generate_map()
         else:
             self.MAP = map_image_dir
         if grad is None:
@@ -60,6 +66,8 @@ class MazeEnv(gym.Env):
         self._deter = deter
         self._gui_disabled = True
         self._set = False
+        self._renderer = None
+        self._rendered_visited = 0
         # set action and observation space
         self._xsize = self._problem.get_dimensions()[0]
         self._ysize = self._problem.get_dimensions()[1]
@@ -100,10 +108,25 @@ class MazeEnv(gym.Env):
             self._path.append(self._problem.get_start_state())
         self._visited.append(self._problem.get_start_state())
         self._curr_state = self._problem.get_start_state()
+        if self._renderer is not None:
+            self._renderer.clear()
+            self._rendered_visited = 0
         return self._get_observation()
 
     def render(self, mode='human', close=False, visited=None, explored=None):
+        '''
+        @param mode: 'human' - show the GUI, 'rgb_array' - draw offscreen without a display, see
+        L{get_offscreen_renderer}
+        @return: None for 'human', numpy.ndarray of shape (height, width, 3) for 'rgb_array'
+        '''
         assert self._set, "reset() must be called first!"
+        if mode == 'rgb_array':
+            renderer = self.get_offscreen_renderer()
+            # visited states are only appended, pass those added since the last render
+            renderer.set_visited(self._visited[self._rendered_visited:])
+            self._rendered_visited = len(self._visited)
+            renderer.set_explored([self._curr_state] if explored is None else explored)
+            return renderer.render()
         self._gui_disabled = False
         if visited is None:
             self._problem.set_visited(self._visited)
@@ -117,12 +140,25 @@ class MazeEnv(gym.Env):
         self._problem.show_and_break()
         self._gui_on = True
 
+    def get_offscreen_renderer(self, cell_size=None):
+        '''
+        Renderer used by render(mode='rgb_array'), created on the first call. Use it to save frames, the path,
+        values or a policy without a display.
+        @param cell_size: size of a cell in pixels, when the renderer is created
+        @return: kuimaze.offscreen.OffscreenRenderer
+        '''
+        if self._renderer is None:
+            self._renderer = OffscreenRenderer(self._problem, cell_size or kuimaze.offscreen.CELL_SIZE)
+            self._rendered_visited = 0
+        return self._renderer
+
     def close(self):
         self._gui_disabled = True
         self._problem.close_gui()
 
     def seed(self, seed=None):
         self.np_random, seed = seeding.np_random(seed)
+        self._problem.seed(seed)
         return [seed]
 
     def save_path(self):
@@ -327,7 +363,7 @@ class EasyMazeEnv(MazeEnv):
         z_axis = vector[0] * self._grad[0] + vector[1] * self._grad[1]
         addition_cost = 0
         if curr in self._problem.hard_places:
-            addition_cost = 5
+            addition_cost = kuimaze.maze.HARD_PLACE_COST
         
         if curr != last:
             reward = abs(vector[0]) + abs(vector[1]) + z_axis + addition_cost
@@ -440,6 +476,13 @@ class MDPMaze(MazeEnv):
     def get_next_states_and_probs(self, state, action):
         return self._problem.get_next_states_and_probs(state, action)
 
+    def get_transition_model(self):
+        '''
+        @return: kuimaze.maze.TransitionModel - transition model compiled into numpy arrays, states are numbered
+        in the order of get_all_states()
+        '''
+        return self._problem.get_transition_model()
+
     def get_state_reward(self,curr):
         return self._problem.get_state_reward(curr)
 
@@ -469,3 +512,99 @@ class InfHardMaze(MazeEnv):
             self._problem.set_probs(probs[0], probs[1], probs[2], probs[3])    # set probabilities here
         else:
             super(InfHardMaze, self).__init__(True, True, True, map_image, grad)
+
+
+class VectorHardMaze:
+    '''
+    K independent agents in the same hard maze, stepped together by numpy operations.
+    Dynamics and rewards are the same as in L{HardMaze}, agents reaching the goal start again from the start state.
+    step(actions) where actions is an integer array of shape (K,); 0 <= action <= 3
+    '''
+    def __init__(self, num_envs, map_image=None, grad=(0, 0), probs=None, node_rewards=None, seed=None):
+        '''
+        @param num_envs: number of agents K
+        @param map_image: path to the map, an image or L{kuimaze.map_loader.MapData}, generated if None
+        @param grad: tuple - vector tuning the tilt of maze
+        @param probs: (obey, confusionL, confusionR, confusion180) or None for a deterministic maze
+        @param seed: seed of the generator confusing the actions
+        '''
+        if map_image is None:
+            map_image = generate_map()
+        self.num_envs = num_envs
+        self._grad = (0, 0) if grad is None else grad
+        self._deter = probs is None
+        self._problem = kuimaze.Maze(map_image, self._grad, node_rewards=node_rewards)
+        self._problem.set_probs_table(*((1, 0, 0, 0) if probs is None else probs))
+        model = self._problem.get_transition_model()
+        self._next_states = model.next_states
+        self._xs, self._ys = model.xs, model.ys
+        start = self._problem.get_start_state()
+        self._start = model.get_state_index(start)
+        self._depth = np.round(self._grad[0] * (self._xs - start.x) + self._grad[1] * (self._ys - start.y), 3)
+        self._goal = np.zeros(len(model), dtype=bool)
+        self._goal[[model.get_state_index(goal) for goal in self._problem.get_goal_nodes()]] = True
+        self._rewards = self.__get_reward_table()
+        self._states = np.full(num_envs, self._start, dtype=int)
+        self._set = False
+        self.single_action_space = spaces.Discrete(4)
+        self.action_space = spaces.MultiDiscrete([4] * num_envs)
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        self._problem.seed(seed)
+        return [seed]
+
+    def reset(self):
+        '''
+        @return: observations of shape (K, 3), rows are (x, y, depth) as in L{HardMaze}
+        '''
+        self._set = True
+        self._states[:] = self._start
+        return self._get_observations(self._states)
+
+    def step(self, actions):
+        '''
+        @param actions: integer array of shape (K,)
+        @return: observations (K, 3), rewards (K,), dones (K,), info dictionary. Observations of agents which
+        reached the goal are already the start state, the goal states are in info['final_observations'] and state
+        numbers (see L{kuimaze.maze.TransitionModel}) before the reset in info['states']
+        '''
+        assert self._set, "reset() must be called first!"
+        actions = np.asarray(actions)
+        assert actions.shape == (self.num_envs,) and ((0 <= actions) & (actions <= 3)).all()
+        if self._deter:
+            outcomes = actions
+        else:
+            outcomes = self._problem.non_det_results(actions)
+        states = self._next_states[outcomes, self._states]
+        rewards = self._rewards[outcomes, self._states]
+        dones = self._goal[states]
+        info = {'states': states, 'final_observations': self._get_observations(states[dones])}
+        self._states = np.where(dones, self._start, states)
+        return self._get_observations(self._states), rewards, dones, info
+
+    def get_states(self):
+        '''
+        @return: state numbers of the agents, in the order of L{kuimaze.maze.Maze.get_all_states}
+        '''
+        return self._states.copy()
+
+    def get_transition_model(self):
+        return self._problem.get_transition_model()
+
+    def _get_observations(self, states):
+        return np.stack([self._xs[states], self._ys[states], self._depth[states]], axis=1)
+
+    def __get_reward_table(self):
+        '''
+        Rewards of L{MazeEnv._get_reward} for every outcome and state
+        @return: numpy.ndarray of shape (4, number of states)
+        '''
+        next_states = self._next_states
+        dx = self._xs[next_states] - self._xs
+        dy = self._ys[next_states] - self._ys
+        rewards = -(np.abs(dx) + np.abs(dy) + dx * self._grad[0] + dy * self._grad[1]).astype(float)
+        rewards[next_states == np.arange(next_states.shape[1])] = -2
+        rewards[self._goal[next_states]] = 100.0
+        return rewards
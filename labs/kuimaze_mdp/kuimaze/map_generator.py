@@ -1,12 +1,26 @@
 '''
-Simple maze generator
+Maze generators. Mazes are produced directly as L{MapData<kuimaze.map_loader.MapData>}, which L{kuimaze.Maze}
+accepts instead of an image, so no image has to be written or parsed. All randomness comes from a seeded
+numpy.random.Generator, the same seed always gives the same maze.
 '''
 
 import numpy
-from numpy.random import random_integers as rand
+from PIL import Image
 
+from .map_loader import MapData, GOAL_COLOR, START_COLOR, HARD_PLACE_COLOR
 
-def maze(width=10, height=10, complexity=.75, density=.75):
+# (dx, dy) of the four neighbours of a cell
+DIRECTIONS = numpy.array([(0, -1), (1, 0), (0, 1), (-1, 0)])
+
+
+def maze(width=10, height=10, complexity=.75, density=.75, seed=None):
+    '''
+    Original generator of random mazes with walls of random length
+    @param seed: seed of the random generator, None for a random maze
+    @return: list of rows of [r, g, b] pixels, start in the top left corner, goal in the bottom right corner
+    (if they are not walls)
+    '''
+    rng = numpy.random.default_rng(seed)
     # Only odd shapes
     width = width + 1
     height = height + 1
@@ -21,7 +35,7 @@ def maze(width=10, height=10, complexity=.75, density=.75):
     Z[:, 0] = Z[:, -1] = 1
     # Make aisles
     for i in range(density):
-        x, y = rand(0, shape[1] // 2) * 2, rand(0, shape[0] // 2) * 2
+        x, y = rng.integers(0, shape[1] // 2 + 1) * 2, rng.integers(0, shape[0] // 2 + 1) * 2
         Z[y, x] = 1
         for j in range(complexity):
             neighbours = []
@@ -34,22 +48,255 @@ def maze(width=10, height=10, complexity=.75, density=.75):
             if y < shape[0] - 2:
                 neighbours.append((y + 2, x))
             if len(neighbours):
-                y_,x_ = neighbours[rand(0, len(neighbours) - 1)]
+                y_,x_ = neighbours[rng.integers(0, len(neighbours))]
                 if Z[y_, x_] == 0:
                     Z[y_, x_] = 1
                     Z[y_ + (y - y_) // 2, x_ + (x - x_) // 2] = 1
                     x, y = x_, y_
-    # convert to maze.py format
-    ret = [[0 for x in range(len(Z[0]) - 2)] for y in range(len(Z) - 2)]
-    for i in range(len(Z)):
-        for j in range(len(Z[0])):
-            if i > 0 and j > 0 and i < len(Z) - 1 and j < len(Z[0]) - 1:
-                if Z[i][j] == 1:
-                    ret[i - 1][j - 1] = [0, 0, 0]
-                else:
-                    ret[i - 1][j - 1] = [255, 255, 255]
-                    if i == 1 and j == 1:
-                        ret[i - 1][j - 1] = [0, 0, 255]
-                    if i == len(Z) - 2 and j == len(Z[0]) - 2:
-                        ret[i - 1][j - 1] = [255, 0, 0]
-    return ret
+    # convert to maze.py format, without the border
+    Z = Z[1:-1, 1:-1]
+    pixels = numpy.where(Z[:, :, numpy.newaxis], 0, 255) * numpy.ones(3, dtype=int)
+    if not Z[0, 0]:
+        pixels[0, 0] = START_COLOR
+    if not Z[-1, -1]:
+        pixels[-1, -1] = GOAL_COLOR
+    return pixels.tolist()
+
+
+class MazeGenerator:
+    '''
+    Generates perfect mazes (exactly one path between any two cells) by a recursive backtracker, randomized
+    Kruskal's algorithm or Wilson's algorithm, or open grids with random obstacles.
+    Perfect mazes of C{width} x C{height} cells are drawn into a grid of (2 * width + 1) x (2 * height + 1) fields
+    where every other field is a wall. The start is in the top left corner and the goal in the bottom right corner.
+    '''
+
+    ALGORITHMS = ['backtracker', 'kruskal', 'wilson', 'obstacles']
+
+    def __init__(self, seed=None):
+        '''
+        @param seed: seed of the random generator, None for random mazes
+        '''
+        self.seed = seed
+        self.rng = numpy.random.default_rng(seed)
+
+    # region API Functions
+
+    def generate(self, algorithm, width, height, hard_places=0.0, **kwargs):
+        '''
+        @param algorithm: one of L{ALGORITHMS}
+        @param width: number of cells in x direction
+        @param height: number of cells in y direction
+        @param hard_places: fraction of free fields (except start and goal) turned into hard places
+        @param kwargs: passed to the algorithm, e.g. density of obstacles
+        @return: generated maze
+        @rtype: L{MapData<kuimaze.map_loader.MapData>}
+        '''
+        if algorithm == 'backtracker':
+            map_data = self.recursive_backtracker(width, height)
+        elif algorithm == 'kruskal':
+            map_data = self.kruskal(width, height)
+        elif algorithm == 'wilson':
+            map_data = self.wilson(width, height)
+        elif algorithm == 'obstacles':
+            map_data = self.random_obstacles(width, height, **kwargs)
+        else:
+            raise ValueError('Unknown maze generator: {}'.format(algorithm))
+        if hard_places > 0:
+            map_data = self.add_hard_places(map_data, hard_places)
+        return map_data
+
+    def generate_batch(self, count, algorithm, width, height, **kwargs):
+        '''
+        Generates many mazes, every maze has its own seed spawned from the seed of the generator,
+        so the i-th maze of a batch does not depend on the number of generated mazes
+        @param count: number of mazes
+        @return: list of generated mazes
+        @rtype: list of L{MapData<kuimaze.map_loader.MapData>}
+        '''
+        seeds = numpy.random.SeedSequence(self.seed).spawn(count)
+        return [MazeGenerator(seed).generate(algorithm, width, height, **kwargs) for seed in seeds]
+
+    def recursive_backtracker(self, width, height):
+        '''
+        Randomized depth-first search, produces long winding corridors
+        '''
+        visited = numpy.zeros((width, height), dtype=bool)
+        # random choices are drawn in blocks, drawing them one by one is slow
+        randoms = self.__random_stream()
+        stack = [(0, 0)]
+        visited[0, 0] = True
+        edges = []
+        while stack:
+            x, y = stack[-1]
+            candidates = [(x + dx, y + dy) for (dx, dy) in DIRECTIONS.tolist()
+                          if 0 <= x + dx < width and 0 <= y + dy < height and not visited[x + dx, y + dy]]
+            if not candidates:
+                stack.pop()
+                continue
+            nx, ny = candidates[int(next(randoms) * len(candidates))]
+            visited[nx, ny] = True
+            edges.append((x, y, nx, ny))
+            stack.append((nx, ny))
+        return self.__carve(width, height, edges)
+
+    def kruskal(self, width, height):
+        '''
+        Randomized Kruskal's algorithm, walls between cells are removed in random order unless they
+        would create a cycle, produces many short dead ends
+        '''
+        # all walls between horizontally and vertically neighbouring cells
+        xs, ys = numpy.meshgrid(numpy.arange(width), numpy.arange(height), indexing='ij')
+        horizontal = numpy.stack([xs[:-1].ravel(), ys[:-1].ravel(), xs[1:].ravel(), ys[1:].ravel()], axis=1)
+        vertical = numpy.stack([xs[:, :-1].ravel(), ys[:, :-1].ravel(), xs[:, 1:].ravel(), ys[:, 1:].ravel()], axis=1)
+        walls = numpy.concatenate([horizontal, vertical])
+        walls = walls[self.rng.permutation(len(walls))]
+        first = (walls[:, 0] * height + walls[:, 1]).tolist()
+        second = (walls[:, 2] * height + walls[:, 3]).tolist()
+
+        parent = list(range(width * height))
+
+        def find(cell):
+            while parent[cell] != cell:
+                parent[cell] = parent[parent[cell]]
+                cell = parent[cell]
+            return cell
+
+        removed = numpy.zeros(len(walls), dtype=bool)
+        for i in range(len(walls)):
+            a, b = find(first[i]), find(second[i])
+            if a != b:
+                parent[a] = b
+                removed[i] = True
+        return self.__carve(width, height, walls[removed].tolist())
+
+    def wilson(self, width, height):
+        '''
+        Wilson's algorithm, loop-erased random walks, samples uniformly from all perfect mazes
+        '''
+        in_tree = numpy.zeros((width, height), dtype=bool)
+        in_tree[self.rng.integers(width), self.rng.integers(height)] = True
+        randoms = self.__random_stream()
+        directions = DIRECTIONS.tolist()
+        edges = []
+        # cells not yet in the tree, in random order
+        order = self.rng.permutation(width * height).tolist()
+        for cell in order:
+            x, y = divmod(cell, height)
+            if in_tree[x, y]:
+                continue
+            # random walk until the tree is hit, remembering only the last exit of every cell erases the loops
+            exits = {}
+            cx, cy = x, y
+            while not in_tree[cx, cy]:
+                dx, dy = directions[int(next(randoms) * 4)]
+                nx, ny = cx + dx, cy + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    exits[cx, cy] = (nx, ny)
+                    cx, cy = nx, ny
+            cx, cy = x, y
+            while not in_tree[cx, cy]:
+                in_tree[cx, cy] = True
+                nx, ny = exits[cx, cy]
+                edges.append((cx, cy, nx, ny))
+                cx, cy = nx, ny
+        return self.__carve(width, height, edges)
+
+    def random_obstacles(self, width, height, density=0.3, connected=True, max_attempts=100):
+        '''
+        Open grid of C{width} x C{height} fields with randomly placed wall fields
+        @param density: probability of a field to be a wall
+        @param connected: resample until the goal is reachable from the start
+        @param max_attempts: maximum number of samples when connected is True
+        @raise ValueError: if no connected grid was sampled in max_attempts
+        '''
+        start, goal = (0, 0), (width - 1, height - 1)
+        for _ in range(max_attempts):
+            free = self.rng.random((width, height)) >= density
+            free[start] = free[goal] = True
+            if not connected or self.__reachable(free, start)[goal]:
+                return MapData(free=free, start=start, goals=[goal], hard_places=[])
+        raise ValueError('No connected grid found, decrease the density of obstacles')
+
+    def add_hard_places(self, map_data, fraction):
+        '''
+        @param fraction: fraction of free fields (except start and goal) turned into hard places
+        @return: copy of the maze with hard places
+        @rtype: L{MapData<kuimaze.map_loader.MapData>}
+        '''
+        candidates = numpy.array(map_data.free)
+        candidates[map_data.start] = False
+        for goal in map_data.goals:
+            candidates[goal] = False
+        xs, ys = numpy.nonzero(candidates)
+        chosen = numpy.sort(self.rng.choice(len(xs), int(fraction * len(xs)), replace=False))
+        # same order as the map loader - by rows of the image
+        hard_places = sorted(zip(xs[chosen].tolist(), ys[chosen].tolist()), key=lambda p: (p[1], p[0]))
+        return map_data._replace(hard_places=hard_places)
+
+    # endregion
+
+    # region Helper Functions
+
+    def __carve(self, width, height, edges):
+        '''
+        @param edges: list of (x1, y1, x2, y2) of neighbouring cells connected by the maze
+        @return: maze with cells and removed walls between connected cells free
+        '''
+        free = numpy.zeros((2 * width + 1, 2 * height + 1), dtype=bool)
+        free[1::2, 1::2] = True
+        if len(edges):
+            edges = numpy.asarray(edges)
+            free[edges[:, 0] + edges[:, 2] + 1, edges[:, 1] + edges[:, 3] + 1] = True
+        return MapData(free=free, start=(1, 1), goals=[(2 * width - 1, 2 * height - 1)], hard_places=[])
+
+    def __random_stream(self, block=4096):
+        '''
+        Infinite generator of uniform numbers from [0, 1)
+        '''
+        while True:
+            yield from self.rng.random(block).tolist()
+
+    @staticmethod
+    def __reachable(free, start):
+        '''
+        Flood fill by repeated dilation of the reached area
+        @return: boolean array of fields reachable from the start
+        '''
+        reached = numpy.zeros(free.shape, dtype=bool)
+        reached[start] = True
+        while True:
+            grown = reached.copy()
+            grown[1:] |= reached[:-1]
+            grown[:-1] |= reached[1:]
+            grown[:, 1:] |= reached[:, :-1]
+            grown[:, :-1] |= reached[:, 1:]
+            grown &= free
+            if (grown == reached).all():
+                return reached
+            reached = grown
+
+    # endregion
+
+
+def to_pixels(map_data):
+    '''
+    @param map_data: maze
+    @type map_data: L{MapData<kuimaze.map_loader.MapData>}
+    @return: numpy.ndarray of shape (y, x, 3) with colors understood by L{kuimaze.Maze}
+    '''
+    pixels = numpy.where(map_data.free.T[:, :, numpy.newaxis], 255, 0).astype(numpy.uint8) * numpy.ones(3, numpy.uint8)
+    for (x, y) in map_data.hard_places:
+        pixels[y, x] = HARD_PLACE_COLOR
+    for (x, y) in map_data.goals:
+        pixels[y, x] = GOAL_COLOR
+    if map_data.start is not None:
+        pixels[map_data.start[1], map_data.start[0]] = START_COLOR
+    return pixels
+
+
+def save_image(map_data, filename):
+    '''
+    Saves the maze as an image, use a lossless format such as png or bmp
+    '''
+    Image.fromarray(to_pixels(map_data)).save(filename)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Vectorized loading of maze images. Walls, goals, start and hard places are found by numpy masks, maps loaded
+from files are cached as compressed .npz files keyed by the hash of the image file. The cache directory is taken
+from the environment variable KUIMAZE_CACHE_DIR, an empty value disables the cache.
+'''
+
+import collections
+import hashlib
+import os
+import numpy as np
+from PIL import Image
+
+#: Directory of the cached maps, None disables the cache
+CACHE_DIR = os.environ.get('KUIMAZE_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'kuimaze')) or None
+#: Increase when the cached format changes
+CACHE_VERSION = 1
+
+GOAL_COLOR = (255, 0, 0)
+START_COLOR = (0, 0, 255)
+HARD_PLACE_COLOR = (0, 255, 0)
+
+#: Parsed map. C{free} is a boolean array of shape (x, y), C{start} is (x, y) or None, C{goals} and C{hard_places}
+#: are lists of (x, y) in the order of rows of the image
+MapData = collections.namedtuple('MapData', ['free', 'start', 'goals', 'hard_places'])
+
+
+def load_map(image, use_cache=True):
+    '''
+    @param image: path to an RGB image (str or os.PathLike), the image itself (anything numpy.array accepts, rows of [r, g, b])
+    or an already parsed L{MapData}, e.g. from L{kuimaze.map_generator.MazeGenerator}
+    @param use_cache: read and write the .npz cache for images given by path, ignored if L{CACHE_DIR} is None
+    @return: parsed map
+    @rtype: L{MapData}
+    @raise AssertionError: When image is not RGB image
+    '''
+    if isinstance(image, MapData):
+        return image
+    if not isinstance(image, (str, os.PathLike)):
+        return parse_pixels(np.asarray(image))
+    if CACHE_DIR is None or not use_cache:
+        return parse_pixels(np.asarray(Image.open(image)))
+
+    with open(image, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    cache_file = os.path.join(CACHE_DIR, 'v{}-{}.npz'.format(CACHE_VERSION, digest))
+    if os.path.exists(cache_file):
+        try:
+            return __read_cache(cache_file)
+        except (OSError, ValueError, KeyError):
+            pass  # broken cache file, parse the image again
+
+    map_data = parse_pixels(np.asarray(Image.open(image)))
+    try:
+        __write_cache(cache_file, map_data)
+    except OSError:
+        pass  # caching is only an optimization
+    return map_data
+
+
+def parse_pixels(pixels):
+    '''
+    @param pixels: numpy.ndarray of shape (rows, columns, 3)
+    @return: parsed map, a cell is free if any of its channels is not zero, the start is the last
+    start-colored pixel in the order of rows
+    @rtype: L{MapData}
+    '''
+    assert (len(pixels.shape) == 3 and pixels.shape[2] == 3)
+    free = pixels.any(axis=2).T
+    starts = __find_color(pixels, START_COLOR)
+    return MapData(free=free,
+                   start=starts[-1] if starts else None,
+                   goals=__find_color(pixels, GOAL_COLOR),
+                   hard_places=__find_color(pixels, HARD_PLACE_COLOR))
+
+
+def __find_color(pixels, color):
+    '''
+    @return: list of (x, y) of the pixels of a given color, in the order of rows
+    '''
+    ys, xs = np.nonzero((pixels == color).all(axis=2))
+    return list(zip(xs.tolist(), ys.tolist()))
+
+
+def __read_cache(cache_file):
+    with np.load(cache_file) as data:
+        shape = tuple(data['shape'])
+        free = np.unpackbits(data['free'], count=shape[0] * shape[1]).reshape(shape).astype(bool)
+        start = tuple(data['start'].tolist()) if len(data['start']) else None
+        return MapData(free=free, start=start,
+                       goals=[tuple(p) for p in data['goals'].tolist()],
+                       hard_places=[tuple(p) for p in data['hard_places'].tolist()])
+
+
+def __write_cache(cache_file, map_data):
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    # write into a temporary file first, so that concurrent readers never see a partial file
+    temporary_file = '{}.{}.tmp.npz'.format(cache_file[:-4], os.getpid())
+    np.savez_compressed(temporary_file,
+                        shape=np.array(map_data.free.shape),
+                        free=np.packbits(map_data.free),
+                        start=np.array(map_data.start if map_data.start is not None else [], dtype=int),
+                        goals=np.array(map_data.goals, dtype=int).reshape(-1, 2),
+                        hard_places=np.array(map_data.hard_places, dtype=int).reshape(-1, 2))
+    os.replace(temporary_file, cache_file)
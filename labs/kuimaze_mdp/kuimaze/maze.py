@@ -10,16 +10,17 @@ Main part of kuimaze - framework for working with mazes. Contains class Maze (ca
 
 import collections
 import enum
+import hashlib
 import numpy as np
 import os
-import random
 import warnings
-from PIL import Image, ImageTk
+from PIL import ImageTk
 import sys
 
 import tkinter
 
 import kuimaze
+from kuimaze import map_loader
 
 # nicer warnings
 fw_orig = warnings.formatwarning
@@ -62,6 +63,12 @@ FONT_FAMILY = "Helvetica"
 #: Text size in GUI (not on Canvas itself)
 FONT_SIZE = round(12*MAX_CELL_SIZE/50)
 
+#: Number of compiled transition models kept in memory, see L{Maze.get_transition_model}
+TRANSITION_MODEL_CACHE_SIZE = 8
+
+#: Additional cost of leaving a hard place, see L{AdjacencyIndex}
+HARD_PLACE_COST = 5
+
 
 class SHOW(enum.Enum):
     '''
@@ -93,82 +100,233 @@ class ACTION(enum.Enum):
             return "<"
 
 
-class ProbsRoulette:
+class ActionProbsTable:
     '''
-    Class for probabilistic maze - implements roulette wheel with intervals
+    Probabilities of the outcomes of actions in a probabilistic maze, stored as a 4x4 matrix: C{matrix[a, o]} is the
+    probability that attempted action C{a} ends as the move C{o} (values of L{ACTION}). Outcomes are sampled by
+    a C{numpy.random.Generator}, one at a time by L{confuse_action} or for a whole array by L{confuse_actions}.
     '''
 
-    def __init__(self, obey=0.8, confusionL=0.1, confusionR=0.1, confusion180=0):
-        # create bounds -> use defined method 'set_probs' outside init
-        self._obey = None
-        self._confusionLeft = None
-        self._confusionRight = None
+    def __init__(self, obey=0.8, confusionL=0.1, confusionR=0.1, confusion180=0, seed=None):
+        '''
+        @param obey: probability that the action is performed
+        @param confusionL: probability of a move to the left of the action
+        @param confusionR: probability of a move to the right of the action
+        @param confusion180: probability of a move opposite to the action
+        @param seed: seed of the generator, or a C{numpy.random.Generator} to use
+        '''
+        self.matrix = None
         self.set_probs(obey, confusionL, confusionR, confusion180)
+        self.seed(seed)
+
+    def set_probs(self, obey, confusionL, confusionR, confusion180):
+        assert abs(1-(obey+confusionR+confusionL+confusion180)) < 0.00001
+        matrix = np.zeros((4, 4))
+        actions = np.arange(4)
+        matrix[actions, actions] = obey
+        matrix[actions, (actions - 1) % 4] = confusionL
+        matrix[actions, (actions + 1) % 4] = confusionR
+        matrix[actions, (actions + 2) % 4] = confusion180
+        matrix.flags.writeable = False
+        self.matrix = matrix
+        # cumulative probabilities of the outcomes of every action, the last one catches rounding errors
+        self.__cumulative = np.cumsum(matrix, axis=1)
+        self.__cumulative[:, -1] = np.inf
+
+    def seed(self, seed=None):
+        '''
+        @param seed: seed of the generator, or a C{numpy.random.Generator} to use
+        @return: the generator
+        @rtype: numpy.random.Generator
+        '''
+        self.np_random = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+        return self.np_random
+
+    def confuse_action(self, action):
+        '''
+        @param action: attempted action, its value or L{ACTION}
+        @return: value of the performed move
+        @rtype: int
+        '''
+        action = action.value if isinstance(action, ACTION) else action
+        return int((self.np_random.random() >= self.__cumulative[action]).sum())
+
+    def confuse_actions(self, actions):
+        '''
+        @param actions: integer array of attempted actions (values of L{ACTION})
+        @return: integer array of the performed moves of the same shape
+        @rtype: numpy.ndarray
+        '''
+        actions = np.asarray(actions)
+        roulette = self.np_random.random(actions.shape)
+        return (roulette[..., np.newaxis] >= self.__cumulative[actions]).sum(axis=-1)
+
+    @property
+    def probtable(self):
+        '''
+        @return: dictionary {(action, outcome): probability} keyed by L{ACTION}
+        '''
+        return dict(((action, outcome), self.matrix[action.value, outcome.value]) for action in ACTION
+                    for outcome in ACTION)
+
+    def __getitem__(self, item):
+        action, outcome = item
+        return self.matrix[action.value if isinstance(action, ACTION) else action,
+                           outcome.value if isinstance(outcome, ACTION) else outcome]
+
+    def __str__(self):
+        return str(self.probtable)
+
+
+class ProbsRoulette(ActionProbsTable):
+    '''
+    Class for probabilistic maze - implements roulette wheel with intervals
+    '''
 
     def set_probs(self, obey, confusionL, confusionR, confusion180):
-        assert obey + confusionL + confusionR + confusion180 == 1
         assert 0 <= obey <= 1
         assert 0 <= confusionL <= 1
         assert 0 <= confusionR <= 1
         assert 0 <= confusion180 <= 1
-        self._obey = obey
-        self._confusionLeft = self._obey + confusionL
-        self._confusionRight = self._confusionLeft + confusionR
+        super().set_probs(obey, confusionL, confusionR, confusion180)
 
-    def confuse_action(self, action):
-        roulette = random.uniform(0.0, 1.0)
-        if 0 <= roulette < self._obey:
-            return action
-        else:
-            # Confused left
-            if self._obey <= roulette < self._confusionLeft:
-                return (action - 1) % 4
-            else:
-                # Confused right
-                if self._confusionLeft <= roulette < self._confusionRight:
-                    return (action + 1) % 4
-                else:
-                    # Confused back
-                    return (action + 2) % 4
 
-    def __str__(self):
-        return str(self.probtable)
+class TransitionModel:
+    '''
+    Array-backed transition model of a maze. States are numbered in the order of L{Maze.get_all_states}.
+    Attempting action C{a} in state C{s} ends with probability C{probs[a, k]} in the state C{next_states[k, s]},
+    where the outcome C{k} is a move in the direction C{ACTION(k)}. Moves into walls or out of the maze end in the same state.
+    '''
 
+    def __init__(self, maze, deltas, probs):
+        '''
+        @param maze: boolean numpy.ndarray of shape (x, y), True for free cells
+        @param deltas: list of (dx, dy) of the moves indexed by action value
+        @param probs: numpy.ndarray of shape (4, 4) with probability of outcome (column) for attempted action (row)
+        '''
+        self.actions = list(ACTION)
+        self.xs, self.ys = np.nonzero(maze)
+        self.index = -np.ones(maze.shape, dtype=int)
+        self.index[self.xs, self.ys] = np.arange(len(self.xs))
+        self.next_states = np.empty((len(self.actions), len(self.xs)), dtype=int)
+        own = np.arange(len(self.xs))
+        for k, (dx, dy) in enumerate(deltas):
+            nx = self.xs + dx
+            ny = self.ys + dy
+            inside = (nx >= 0) & (nx < maze.shape[0]) & (ny >= 0) & (ny < maze.shape[1])
+            target = own.copy()
+            target[inside] = self.index[nx[inside], ny[inside]]
+            self.next_states[k] = np.where(target >= 0, target, own)
+        self.probs = np.array(probs, dtype=float)
+        self.next_states.flags.writeable = False
+        self.probs.flags.writeable = False
+        self.index.flags.writeable = False
+
+    def __len__(self):
+        return len(self.xs)
+
+    def get_state_index(self, current_state):
+        '''
+        @param current_state: state L{namedtuple state<state>}
+        @return: number of the state, -1 for walls
+        @rtype: int
+        '''
+        return int(self.index[current_state.x, current_state.y])
 
-class ActionProbsTable:
-    def __init__(self, obey=0.8, confusionL=0.1, confusionR=0.1, confusion180=0):
-        assert abs(1-(obey+confusionR+confusionL+confusion180)) < 0.00001
-        # self.obey = obey
-        # self.confusion90 = confusion90
-        # self.confusion180 = confusion180
-        self.probtable = dict()
-        self.probtable[ACTION.UP, ACTION.LEFT] = confusionL
-        self.probtable[ACTION.UP, ACTION.UP] = obey
-        self.probtable[ACTION.UP, ACTION.RIGHT] = confusionR
-        self.probtable[ACTION.UP, ACTION.DOWN] = confusion180
-
-        self.probtable[ACTION.RIGHT, ACTION.LEFT] = confusion180
-        self.probtable[ACTION.RIGHT, ACTION.UP] = confusionL
-        self.probtable[ACTION.RIGHT, ACTION.RIGHT] = obey
-        self.probtable[ACTION.RIGHT, ACTION.DOWN] = confusionR
-
-        self.probtable[ACTION.DOWN, ACTION.LEFT] = confusionR
-        self.probtable[ACTION.DOWN, ACTION.UP] = confusion180
-        self.probtable[ACTION.DOWN, ACTION.RIGHT] = confusionL
-        self.probtable[ACTION.DOWN, ACTION.DOWN] = obey
-
-        self.probtable[ACTION.LEFT, ACTION.LEFT] = obey
-        self.probtable[ACTION.LEFT, ACTION.UP] = confusionR
-        self.probtable[ACTION.LEFT, ACTION.RIGHT] = confusion180
-        self.probtable[ACTION.LEFT, ACTION.DOWN] = confusionL
+    def get_next_states_and_probs(self, state_index, action):
+        '''
+        Array counterpart of L{Maze.get_next_states_and_probs}
+        @param state_index: number of the state
+        @param action: L{action from ACTION<ACTION>}
+        @return: tuple of arrays (numbers of next states, probabilities), one item per outcome
+        @rtype: tuple
+        '''
+        return self.next_states[:, state_index], self.probs[action.value]
 
-    def __getitem__(self, item):
-        return self.probtable[item]
 
-    def __str__(self):
-        return str(self.probtable)
+class AdjacencyIndex:
+    '''
+    Compressed sparse row index of the moves between neighbouring cells. Cells are identified by
+    C{cell_id = x * y_size + y}, the moves from a cell are stored in C{neighbours[indptr[cell_id]:indptr[cell_id + 1]]}
+    together with their C{costs} and C{actions} (values of L{ACTION}), in the order of actions. Walls have no moves.
 
+    Moving from C{a} to the neighbour C{b} costs C{1 + (a - b) . grad}, plus L{HARD_PLACE_COST} if C{a} is a hard place,
+    the same as the costs returned by C{EasyMazeEnv.expand}.
+    '''
 
+    def __init__(self, free, deltas, grad, hard_places=()):
+        '''
+        @param free: boolean numpy.ndarray of shape (x, y), True for cells without a wall
+        @param deltas: list of (dx, dy) of the moves indexed by action value
+        @param grad: tuple - vector tuning the tilt of maze
+        @param hard_places: iterable of L{namedtuple state<state>}
+        '''
+        self.shape = free.shape
+        self.grad = tuple(grad)
+        self.free = free.copy()
+        self.free.flags.writeable = False
+        hard = np.zeros(free.shape, dtype=bool)
+        for place in hard_places:
+            hard[place.x, place.y] = True
+        padded = np.pad(free, 1, mode='constant', constant_values=False)
+        # moves[k] is True where the action k leads to a different cell
+        moves = np.empty((len(deltas),) + free.shape, dtype=bool)
+        costs = np.empty(moves.shape, dtype=float)
+        for k, (dx, dy) in enumerate(deltas):
+            moves[k] = free & padded[1 + dx:1 + dx + free.shape[0], 1 + dy:1 + dy + free.shape[1]]
+            # same sequence of operations as EasyMazeEnv._get_cost so that the costs are equal
+            z_axis = -dx * grad[0] + -dy * grad[1]
+            costs[k] = np.where(hard, abs(dx) + abs(dy) + z_axis + HARD_PLACE_COST, abs(dx) + abs(dy) + z_axis)
+        # edges sorted by the cell and then by the action
+        order = np.moveaxis(moves, 0, -1).reshape(free.size, len(deltas))
+        cell_ids, actions = np.nonzero(order)
+        offsets = np.array([dx * free.shape[1] + dy for (dx, dy) in deltas])
+        self.indptr = np.zeros(free.size + 1, dtype=int)
+        np.cumsum(order.sum(axis=1), out=self.indptr[1:])
+        self.neighbours = cell_ids + offsets[actions]
+        self.actions = actions
+        self.costs = np.moveaxis(costs, 0, -1).reshape(free.size, len(deltas))[cell_ids, actions]
+        #: True if all moves cost the same
+        self.uniform = bool(len(self.costs) == 0 or (self.costs == self.costs[0]).all())
+        for array in (self.indptr, self.neighbours, self.actions, self.costs):
+            array.flags.writeable = False
+        self.__lists = None
+
+    def __len__(self):
+        '''
+        @return: number of cells including walls
+        '''
+        return self.shape[0] * self.shape[1]
+
+    def get_cell_id(self, x, y):
+        return x * self.shape[1] + y
+
+    def get_position(self, cell_id):
+        '''
+        @return: coordinates (x, y) of the cell
+        @rtype: tuple
+        '''
+        return divmod(cell_id, self.shape[1])
+
+    def get_moves(self, cell_id):
+        '''
+        Returns the moves from a cell as views into the index, no copy is made
+        @return: tuple of arrays (neighbour cell ids, costs, actions)
+        @rtype: tuple
+        '''
+        start, end = self.indptr[cell_id], self.indptr[cell_id + 1]
+        return self.neighbours[start:end], self.costs[start:end], self.actions[start:end]
+
+    def as_lists(self):
+        '''
+        The index converted into python lists once, iterating lists from python is much faster than numpy arrays:
+        C{for i in range(indptr[cell_id], indptr[cell_id + 1]): neighbours[i], costs[i]}
+        @return: tuple of lists (indptr, neighbours, costs, actions)
+        @rtype: tuple
+        '''
+        if self.__lists is None:
+            self.__lists = (self.indptr.tolist(), self.neighbours.tolist(), self.costs.tolist(), self.actions.tolist())
+        return self.__lists
 
 
 class Maze:
@@ -177,9 +335,11 @@ class Maze:
     '''
     __deltas = [[0, -1], [1, 0], [0, 1], [-1, 0]]
     __ACTIONS = [ACTION.UP, ACTION.RIGHT, ACTION.DOWN, ACTION.LEFT]
+    # compiled transition models shared by all mazes, keyed by map and probability table
+    __transition_models = collections.OrderedDict()
 
     def __init__(self, image, grad, node_rewards=None, path_costs=None, trans_probs=None, show_level=SHOW.FULL_MAZE,
-                 start_node=None, goal_nodes=None, ):
+                 start_node=None, goal_nodes=None, use_cache=True):
         '''
         Parameters node_rewards, path_costs and trans_probs are meant for defining more complicated mazes. Parameter start_node redefines start state completely, parameter goal_nodes will add nodes to a list of goal nodes.
 
@@ -205,18 +365,14 @@ class Maze:
         @type start_node: L{namedtuple state<state>} or None for default start state loaded from image.
         @keyword goal_nodes: Appending to a list of goal nodes. Must be valid nodes inside a problem without a wall.
         @type goal_nodes: iterable of L{namedtuples state<state>} or None for default set of goal nodes loaded from image.
+        @keyword use_cache: cache the parsed image file as .npz, see L{kuimaze.map_loader.load_map}
+        @type use_cache: boolean
 
         @raise AssertionError: When image is not RGB image or if show is not of type L{kuimaze.SHOW} or if initialization didn't finish correctly.
         '''
-        try:
-            im_data = Image.open(image)
-            self.__filename = image
-        except:
-            im_data = image
-            self.__filename = 'given'
-        maze = np.array(im_data, dtype=int)
-        assert (len(maze.shape) == 3 and maze.shape[2] == 3)
-        self.__maze = maze.sum(axis=2, dtype=bool).T
+        self.__filename = os.fspath(image) if isinstance(image, (str, os.PathLike)) else 'given'
+        map_data = map_loader.load_map(image, use_cache)
+        self.__maze = map_data.free
         self.__start = None
         self.__finish = None
         self.hard_places = []
@@ -224,6 +380,7 @@ class Maze:
         self.__node_utils = None
         self.__path_costs = None
         self.__trans_probs = None
+        self.__transition_model = None
         self.__i = 0
         self.__till_end = False
         self.__gui_root = None
@@ -241,18 +398,11 @@ class Maze:
 
         self.__has_triangles = False
 
-        maze = maze.tolist()
-        finish = []
         if start_node is None or goal_nodes is None:
-            for y, col in enumerate(maze):
-                for x, cell in enumerate(col):
-                    if cell == [255, 0, 0]:
-                        finish.append(state(x, y))
-                    if cell == [0, 0, 255]:
-                        self.__start = state(x, y)
-                    if cell == [0, 255, 0]:
-                        self.hard_places.append(state(x, y))
-            self.__finish = frozenset(finish)
+            if map_data.start is not None:
+                self.__start = state(*map_data.start)
+            self.hard_places = [state(x, y) for (x, y) in map_data.hard_places]
+            self.__finish = frozenset(state(x, y) for (x, y) in map_data.goals)
 
         if start_node is not None:
             if self.__is_inside_valid(start_node):
@@ -280,16 +430,11 @@ class Maze:
             print(self.__node_rewards)
 
         if self.__node_rewards is None:
-            self.__node_rewards = np.zeros(self.__maze.shape, dtype=float)
-            for y, col in enumerate(maze):
-                for x, cell in enumerate(col):
-                    pos = state(x,y)
-                    if pos in self.__finish:
-                        self.__node_rewards[x,y] = 1
-                    elif pos in self.hard_places:
-                        self.__node_rewards[x,y] = -10
-                    else:
-                        self.__node_rewards[x,y] = -0.04
+            self.__node_rewards = np.full(self.__maze.shape, -0.04, dtype=float)
+            for pos in self.hard_places:
+                self.__node_rewards[pos.x, pos.y] = -10
+            for pos in self.__finish:
+                self.__node_rewards[pos.x, pos.y] = 1
             print(self.__node_rewards)
 
         if self.__node_utils is None:
@@ -318,6 +463,7 @@ class Maze:
         assert (self.__node_rewards is not None)
         assert (self.__path_costs is not None)
         assert (self.__trans_probs is not None)
+        self.__adjacency = None
         print('maze init done')
 
     def get_state_reward(self, state):
@@ -386,6 +532,14 @@ class Maze:
         '''
         return self.__maze.shape
 
+    def get_free_cells(self):
+        '''
+        Returns a mask of cells without a wall
+        @return: boolean array of shape L{get_dimensions()<get_dimensions>}, True for cells without a wall
+        @rtype: numpy.ndarray
+        '''
+        return self.__maze.copy()
+
     def get_actions(self, current_state):
         '''
         Generate (yield) actions possible for the current_state
@@ -441,11 +595,54 @@ class Maze:
             if self.__changed_cells is not None:
                 self.__changed_cells.append(state)
 
+    def get_adjacency(self):
+        '''
+        Returns the index of moves between neighbouring cells with their costs, built once on the first call
+        @return: adjacency index
+        @rtype: L{AdjacencyIndex}
+        '''
+        if self.__adjacency is None:
+            self.__adjacency = AdjacencyIndex(self.__maze, self.__deltas, self.__grad, self.hard_places)
+        return self.__adjacency
+
+    def get_transition_model(self):
+        '''
+        Returns the transition model compiled into numpy arrays. It is built once and cached
+        per map and probability table, changing the probabilities invalidates it.
+        @return: compiled transition model
+        @rtype: L{TransitionModel}
+        '''
+        if self.__transition_model is None:
+            probs = tuple(map(tuple, self.__trans_probs.matrix.tolist()))
+            key = (self.__filename, self.__maze.shape, hashlib.sha1(self.__maze.tobytes()).hexdigest(), probs)
+            models = Maze.__transition_models
+            if key in models:
+                models.move_to_end(key)
+            else:
+                models[key] = TransitionModel(self.__maze, self.__deltas, probs)
+                if len(models) > TRANSITION_MODEL_CACHE_SIZE:
+                    models.popitem(last=False)
+            self.__transition_model = models[key]
+        return self.__transition_model
+
     def set_probs(self, obey, confusionL, confusionR, confusion180):
         self.__trans_probs.set_probs(obey, confusionL, confusionR, confusion180)
+        self.__transition_model = None
 
     def set_probs_table(self, obey, confusionL, confusionR, confusion180):
-        self.__trans_probs = ActionProbsTable(obey, confusionL, confusionR, confusion180)
+        # the new table keeps sampling from the same generator
+        self.__trans_probs = ActionProbsTable(obey, confusionL, confusionR, confusion180,
+                                              seed=getattr(self.__trans_probs, 'np_random', None))
+        self.__transition_model = None
+
+    def seed(self, seed=None):
+        '''
+        Seeds the generator confusing the actions
+        @param seed: seed, or a C{numpy.random.Generator} to use
+        @return: the generator
+        @rtype: numpy.random.Generator
+        '''
+        return self.__trans_probs.seed(seed)
 
     def set_visited(self, states):
         '''
@@ -461,6 +658,15 @@ class Maze:
         real_action = self.__trans_probs.confuse_action(action)
         return real_action
 
+    def non_det_results(self, actions):
+        '''
+        Array counterpart of L{non_det_result}
+        @param actions: integer array of attempted actions
+        @return: integer array of the performed moves
+        @rtype: numpy.ndarray
+        '''
+        return self.__trans_probs.confuse_actions(actions)
+
     def __is_inside(self, current_state):
         '''
         Check whether a state is inside a problem
@@ -1,21 +1,145 @@
 from abc import ABC, abstractmethod
 import operator
 import random
-import copy
+import heapq
+import time
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+from kuimaze import UtilityGrid, PolicyGrid
+from kuimaze.grids import NO_ACTION
 
 
-def find_policy_via_value_iteration(problem, discount_factor, epsilon):
-    agent = __MDP_VI_agent(problem, discount_factor, epsilon)
+def find_policy_via_value_iteration(problem, discount_factor, epsilon, backend='numpy', report=None):
+    """
+    :param backend: 'numpy' - vectorized Bellman backups over all states at once, 'python' - state by state,
+    'prioritized' - prioritized sweeping, only states whose successors changed are backed up
+    :param report: optional dictionary filled with the number of backups and wall time (numpy and prioritized)
+    """
+    if backend == 'numpy':
+        agent = __MDP_VI_vectorized_agent(problem, discount_factor, epsilon)
+    elif backend == 'prioritized':
+        agent = __MDP_PS_agent(problem, discount_factor, epsilon)
+    else:
+        agent = __MDP_VI_agent(problem, discount_factor, epsilon)
     policy = agent.find_policy()
+    if report is not None and backend != 'python':
+        report.update(agent.report)
     return policy
 
 
-def find_policy_via_policy_iteration(problem, discount_factor):
-    agent = __MDP_PI_agent(problem, discount_factor)
+def find_policy_via_policy_iteration(problem, discount_factor, backend='numpy', evaluation='exact', report=None):
+    """
+    :param backend: 'numpy' - vectorized agent, 'python' - state by state with 10 evaluation sweeps
+    :param evaluation: policy evaluation of the numpy backend, 'exact' - sparse linear solve (replaced by sweeps
+    for mazes with more than MAX_EXACT_STATES states), 'modified' - fixed number of sweeps
+    :param report: optional dictionary filled with iteration counts and wall time of the phases
+    """
+    if backend == 'numpy':
+        agent = __MDP_PI_vectorized_agent(problem, discount_factor, evaluation)
+    else:
+        agent = __MDP_PI_agent(problem, discount_factor)
     policy = agent.find_policy()
+    if report is not None and backend == 'numpy':
+        report.update(agent.report)
     return policy
 
 
+def find_policy_arrays(problem, discount_factor, epsilon=None, method='value_iteration', backend='numpy'):
+    """
+    Solves the problem with a vectorized agent and returns the result as arrays instead of a policy dictionary
+    :param epsilon: maximum permitted error for value iteration, not used by policy iteration
+    :param method: 'value_iteration' or 'policy_iteration'
+    :param backend: backend of value iteration, 'numpy' or 'prioritized'
+    :return: tuple (action indices, utilities, report), arrays indexed by state number in the order of
+    problem.get_all_states(), action indices of terminal states are meaningless
+    """
+    agent = _create_vectorized_agent(problem, discount_factor, epsilon, method, backend)
+    agent.find_policy()
+    return agent.action_indices, agent.utility, agent.report
+
+
+def _create_vectorized_agent(problem, discount_factor, epsilon, method, backend, evaluation='exact',
+                             action_indices=None, utility=None):
+    """
+    :param action_indices: optional initial policy of policy iteration
+    :param utility: optional initial utilities
+    """
+    if method == 'policy_iteration':
+        return __MDP_PI_vectorized_agent(problem, discount_factor, evaluation, action_indices, utility)
+    elif backend == 'prioritized':
+        return __MDP_PS_agent(problem, discount_factor, epsilon, utility)
+    return __MDP_VI_vectorized_agent(problem, discount_factor, epsilon, utility)
+
+
+class SolverSession:
+    """
+    Keeps the last utilities and policy of every map and warm-starts the next solution of the same map from them,
+    e.g. after node_rewards or the probability table were slightly changed. Value iteration starts from the last
+    utilities, policy iteration from the last policy. The work of the last cold start of a map is remembered,
+    report['saved'] is how much less work the warm start needed (iterations, backups for the prioritized backend).
+    """
+
+    def __init__(self, method='value_iteration', backend='numpy', evaluation='exact'):
+        """
+        :param method: 'value_iteration' or 'policy_iteration'
+        :param backend: backend of value iteration, 'numpy' or 'prioritized'
+        :param evaluation: policy evaluation of policy iteration, 'exact' or 'modified'
+        """
+        self.method = method
+        self.backend = backend
+        self.evaluation = evaluation
+        self.report = None
+        self.__solutions = {}
+        self.__cold_work = {}
+
+    def solve(self, problem, discount_factor, epsilon=None, key=None):
+        """
+        :param problem: kuimaze.MDPMaze
+        :param epsilon: maximum permitted error for value iteration, not used by policy iteration
+        :param key: identifier of the map, the map image path of the problem if None
+        :return: PolicyGrid, a mapping where the keyword is a cartesian coordinates tuple (x,y)
+        and the value is the optimal action (Action enum)
+        """
+        if key is None:
+            key = problem.MAP if isinstance(problem.MAP, str) else id(problem)
+        n = len(problem.get_all_states())
+        action_indices, utility = self.__solutions.get(key, (None, None))
+        warm = utility is not None and len(utility) == n
+        if not warm:
+            action_indices, utility = None, None
+
+        agent = _create_vectorized_agent(problem, discount_factor, epsilon, self.method, self.backend,
+                                         self.evaluation, action_indices, utility)
+        policy = agent.find_policy()
+        self.__solutions[key] = (agent.action_indices, agent.utility)
+
+        work = agent.report['backups' if 'iterations' not in agent.report else 'iterations']
+        if not warm:
+            self.__cold_work[key] = work
+        self.report = dict(agent.report)
+        self.report['warm_start'] = warm
+        self.report['saved'] = self.__cold_work[key] - work if warm else 0
+        return policy
+
+    def get_utilities(self, key):
+        """
+        :return: array of the last utilities of the map indexed by state number, None if it was not solved yet
+        """
+        return self.__solutions.get(key, (None, None))[1]
+
+    def forget(self, key=None):
+        """
+        Drops the remembered solution of the map, or of all maps if key is None
+        """
+        if key is None:
+            self.__solutions.clear()
+            self.__cold_work.clear()
+        else:
+            self.__solutions.pop(key, None)
+            self.__cold_work.pop(key, None)
+
+
 # region Helper private classes
 class __MDP_agent(ABC):
     """
@@ -27,15 +151,21 @@ class __MDP_agent(ABC):
         :param gamma: discount factor - a number from range (0,1)
         """
         self.states = env.get_all_states()
+        self.model = env.get_transition_model()
         self.utility = self.__init_utility(env)
         self.gamma = gamma
         self.fn_is_terminal_state = env.is_goal_state
         self.__transitions = {}
+        self.__outcomes = {}
         self.__actions = {}
-        for s in self.states:
+        next_states = self.model.next_states.T.tolist()
+        probs = self.model.probs.tolist()
+        for i, s in enumerate(self.states):
             self.__actions[s] = list(env.get_actions(s))
             for a in self.__actions[s]:
-                self.__transitions[s, a] = [(s, p) for (s, p) in env.get_next_states_and_probs(s, a)]
+                outcomes = list(zip(next_states[i], probs[a.value]))
+                self.__outcomes[s, a] = outcomes
+                self.__transitions[s, a] = [(self.states[j], p) for (j, p) in outcomes]
 
     def get_transition(self, state, action):
         """
@@ -72,9 +202,12 @@ class __MDP_agent(ABC):
         Getter for expected utility for action from a given state
         :param state: State object
         :param action: enum Action
-        :param utility: dictionary of utilities indexed by cartesian coordinates
+        :param utility: UtilityGrid or dictionary of utilities indexed by cartesian coordinates
         :return: total utility (value) for a move attempt in a given direction
         """
+        if isinstance(utility, UtilityGrid):
+            values = utility.array
+            return sum([prob * values[j] for (j, prob) in self.__outcomes[(state, action)]])
         return sum([prob * utility[(s.x, s.y)] for (s, prob) in self.__transitions[(state, action)]])
 
     @staticmethod
@@ -82,24 +215,14 @@ class __MDP_agent(ABC):
         """
         Initialize all utilities to given states reward (except terminal states)
         :param env: kuimaze.MDPMaze object
-        :return: dictionary of utilities, indexed by cartesian coordinates
+        :return: UtilityGrid of the states, walls are left out
         """
-        utils = dict()
-        x_dims = env.observation_space.spaces[0].n
-        y_dims = env.observation_space.spaces[1].n
-
-        for x in range(x_dims):
-            for y in range(y_dims):
-                utils[(x, y)] = 0
-
-        for state in env.get_all_states():
-            utils[(state.x, state.y)] = state.reward
-        return utils
+        return UtilityGrid(env.get_transition_model(), [state.reward for state in env.get_all_states()])
 
     @abstractmethod
     def find_policy(self):
         """
-        :return: dictionary where the keyword is a cartesian coordinates tuple (x,y)
+        :return: PolicyGrid, a mapping where the keyword is a cartesian coordinates tuple (x,y)
         and the value is the optimal action (Action enum)
         """
         pass
@@ -118,17 +241,17 @@ class __MDP_VI_agent(__MDP_agent):
         super().__init__(env, gamma)
 
     def find_policy(self):
-        states = [s for s in self.states if not self.fn_is_terminal_state(s)]
+        states = [(i, s) for i, s in enumerate(self.states) if not self.fn_is_terminal_state(s)]
         optimal_utility = self.utility
         policy = self.__policy
         while True:
             delta = 0
-            utility = copy.deepcopy(optimal_utility)
-            for state in states:
+            utility = optimal_utility.copy()
+            for i, state in states:
                 action, expected_util = self.get_optimal_action(state, utility)
-                optimal_utility[(state.x, state.y)] = state.reward + self.gamma * expected_util
-                policy[(state.x, state.y)] = action
-                delta = max(delta, abs(utility[(state.x, state.y)] - optimal_utility[state.x, state.y]))
+                optimal_utility.array[i] = state.reward + self.gamma * expected_util
+                policy.array[i] = action.value
+                delta = max(delta, abs(utility.array[i] - optimal_utility.array[i]))
             if self.__has_converged(delta):
                 return policy
 
@@ -137,12 +260,9 @@ class __MDP_VI_agent(__MDP_agent):
         """
         Initialize blank policy (with None values)
         :param env: kuimaze.MDPMaze object
-        :return: dictionary of None, indexed by cartesian coordinates
+        :return: PolicyGrid of None
         """
-        policy = dict()
-        for state in env.get_all_states():
-            policy[state.x, state.y] = None
-        return policy
+        return PolicyGrid(env.get_transition_model())
 
     def __has_converged(self, delta):
         """
@@ -162,32 +282,33 @@ class __MDP_PI_agent(__MDP_agent):
         super().__init__(env, gamma)
 
     def find_policy(self):
-        states = [s for s in self.states if not self.fn_is_terminal_state(s)]
+        states = [(i, s) for i, s in enumerate(self.states) if not self.fn_is_terminal_state(s)]
         utility = self.utility
         policy = self.__policy
         while True:
             utility = self.__evaluate_policy(policy, utility, states)
             unchanged = True
-            for state in states:
+            for i, state in states:
                 action, action_util = self.get_optimal_action(state, utility)
-                if action != policy[(state.x, state.y)]:
-                    policy[(state.x, state.y)] = action
+                if action.value != policy.array[i]:
+                    policy.array[i] = action.value
                     unchanged = False
             if unchanged:
                 return policy
 
     def __evaluate_policy(self, policy, utility, states, steps=10):
         """
-        :param policy: dictionary with key => cartesian coordinates (x,y) and value => Action enum
-        :param utility: dictionary with key => cartesian coordinates (x,y) and value => numerical utility
-        :param states: list of non terminal State objects
+        :param policy: PolicyGrid
+        :param utility: UtilityGrid
+        :param states: list of (state number, State object) of non terminal states
         :param steps: number of utility re-evaluations before it is considered stabilized
-        :return: updated utility dictionary
+        :return: updated UtilityGrid
         """
-        for i in range(steps):
-            for state in states:
-                x, y = state.x, state.y
-                utility[(x, y)] = state.reward + self.gamma * self.get_expected_utility(state, policy[(x, y)], utility)
+        actions = self.model.actions
+        for _ in range(steps):
+            for i, state in states:
+                action = actions[policy.array[i]]
+                utility.array[i] = state.reward + self.gamma * self.get_expected_utility(state, action, utility)
         return utility
 
     @staticmethod
@@ -195,14 +316,309 @@ class __MDP_PI_agent(__MDP_agent):
         """
         Initialize all policies randomly (except terminal states)
         :param env: kuimaze.MDPMaze object
-        :return: dictionary of random policies, indexed by cartesian coordinates
+        :return: PolicyGrid of random actions, None in terminal states
         """
-        policy = dict()
-        for state in env.get_all_states():
-            if env.is_goal_state(state):
-                policy[state.x, state.y] = None
-                continue
-            actions = [action for action in env.get_actions(state)]
-            policy[state.x, state.y] = random.choice(actions)
+        policy = PolicyGrid(env.get_transition_model())
+        for i, state in enumerate(env.get_all_states()):
+            if not env.is_goal_state(state):
+                actions = [action for action in env.get_actions(state)]
+                policy.array[i] = random.choice(actions).value
         return policy
+
+
+class __MDP_vectorized_agent(ABC):
+    """
+    Private (abstract) class working with the transition model compiled into arrays (kuimaze.TransitionModel):
+    for every state s and attempted action a the outcome k leads to the state next_states[k, s]
+    with probability probs[a, k], rewards[s] is the reward of the state s.
+    States are numbered in the order of env.get_all_states(). After find_policy the arrays utility
+    and action_indices hold the result.
+    """
+
+    def __init__(self, env, gamma):
+        """
+        :param env: is the environment, an object of the type kuimaze.MDPMaze
+        :param gamma: discount factor - a number from range (0,1)
+        """
+        model = env.get_transition_model()
+        self.model = model
+        self.states = env.get_all_states()
+        self.gamma = gamma
+        self.actions = model.actions
+        self.rewards = np.array([s.reward for s in self.states], dtype=float)
+        self.terminal = np.array([env.is_goal_state(s) for s in self.states], dtype=bool)
+        self.next_states = model.next_states
+        self.probs = model.probs
+
+    def get_q_values(self, utility):
+        """
+        Expected utilities of all actions in all states. Outcomes are summed in the same order as in
+        __MDP_agent.get_expected_utility, so results are identical to the python implementation.
+        :param utility: array of utilities indexed by state number
+        :return: array of shape (number of actions, number of states)
+        """
+        successors = utility[self.next_states]
+        q_values = np.empty((len(self.actions), len(self.states)))
+        for a in range(len(self.actions)):
+            expected = q_values[a]
+            np.multiply(self.probs[a, 0], successors[0], out=expected)
+            for k in range(1, len(self.next_states)):
+                expected += self.probs[a, k] * successors[k]
+        return q_values
+
+    def get_initial_utility(self, utility=None):
+        """
+        :param utility: utilities indexed by state number, e.g. from an earlier solution, or None
+        :return: new array of the utilities with rewards in terminal states, rewards everywhere if utility is None
+        """
+        if utility is None:
+            return self.rewards.copy()
+        return np.where(self.terminal, self.rewards, np.asarray(utility, dtype=float))
+
+    def to_policy(self, action_indices):
+        """
+        :param action_indices: index of the chosen action for every state
+        :return: PolicyGrid, a mapping where the keyword is a cartesian coordinates tuple (x,y)
+        and the value is the action (Action enum), None for terminal states
+        """
+        codes = np.array([action.value for action in self.actions])[action_indices]
+        return PolicyGrid(self.model, np.where(self.terminal, NO_ACTION, codes))
+
+    @abstractmethod
+    def find_policy(self):
+        """
+        :return: PolicyGrid, a mapping where the keyword is a cartesian coordinates tuple (x,y)
+        and the value is the optimal action (Action enum)
+        """
+        pass
+
+
+class __MDP_VI_vectorized_agent(__MDP_vectorized_agent):
+    """
+    MDP agent for setting policy via Value Iteration algorithm, every sweep is a single array operation
+    """
+    def __init__(self, env, gamma, epsilon, utility=None):
+        """
+        :param epsilon: maximum permitted error for the value of each state
+        :param utility: optional initial utilities indexed by state number, rewards if None
+        """
+        self.__epsilon = epsilon
+        super().__init__(env, gamma)
+        self.__initial_utility = self.get_initial_utility(utility)
+        self.report = {'states': len(self.states), 'iterations': 0, 'backups': 0}
+
+    def find_policy(self):
+        start_time = time.time()
+        utility = self.__initial_utility
+        active = ~self.terminal
+        while True:
+            q_values = self.get_q_values(utility)
+            action_indices = np.argmax(q_values, axis=0)
+            optimal_utility = utility.copy()
+            optimal_utility[active] = self.rewards[active] + self.gamma * q_values[:, active].max(axis=0)
+            delta = np.abs(optimal_utility[active] - utility[active]).max() if active.any() else 0
+            utility = optimal_utility
+            self.report['iterations'] += 1
+            self.report['backups'] += int(active.sum())
+            if self.__has_converged(delta):
+                self.report['total_time'] = time.time() - start_time
+                self.utility, self.action_indices = utility, action_indices
+                return self.to_policy(action_indices)
+
+    def __has_converged(self, delta):
+        return delta < (self.__epsilon * ((1 - self.gamma) / self.gamma))
+
+
+class __MDP_PS_agent(__MDP_vectorized_agent):
+    """
+    MDP agent for setting policy via prioritized sweeping, an asynchronous Value Iteration. Every state has
+    a priority, an upper bound of its Bellman residual. The state with the highest priority is backed up, a change
+    of its utility by delta raises the priority of every predecessor p by gamma * max_a P(s|p,a) * |delta|.
+    It stops when no priority reaches the threshold of __MDP_VI_agent.__has_converged, so all residuals are below it,
+    and returns the utilities after one more synchronous backup, which are within epsilon of the optimal ones.
+    """
+    def __init__(self, env, gamma, epsilon, utility=None):
+        """
+        :param epsilon: maximum permitted error for the value of each state
+        :param utility: optional initial utilities indexed by state number, reward / (1 - gamma) if None
+        """
+        self.__epsilon = epsilon
+        super().__init__(env, gamma)
+        if utility is None:
+            # utility of staying in the state forever, already a fixed point for states surrounded by states
+            # with the same reward, so only the states near goals and different rewards need backups
+            utility = np.where(self.terminal, self.rewards, self.rewards / (1 - gamma))
+        self.__initial_utility = self.get_initial_utility(utility)
+        self.__indptr, self.__predecessors, self.__weights = self.__get_predecessors()
+        self.report = {'states': len(self.states), 'backups': 0}
+
+    def find_policy(self):
+        start_time = time.time()
+        threshold = self.__epsilon * ((1 - self.gamma) / self.gamma)
+        gamma = self.gamma
+        active = ~self.terminal
+        utility = self.__initial_utility
+        # the first priorities are the exact residuals
+        backed_up = np.where(active, self.rewards + gamma * self.get_q_values(utility).max(axis=0), utility)
+        priority = np.abs(backed_up - utility)
+        backups = int(active.sum())
+
+        queue = [(-r, s) for s, r in enumerate(priority.tolist()) if r >= threshold]
+        heapq.heapify(queue)
+        utility, priority = utility.tolist(), priority.tolist()
+        successors = self.next_states.T.tolist()
+        probs = self.probs.tolist()
+        rewards = self.rewards.tolist()
+        indptr, predecessors, weights = self.__indptr, self.__predecessors, self.__weights
+        while queue:
+            negative_priority, s = heapq.heappop(queue)
+            if -negative_priority != priority[s]:
+                continue  # outdated entry, the priority has been raised since
+            values = [utility[n] for n in successors[s]]
+            value = rewards[s] + gamma * max(sum(map(operator.mul, action_probs, values)) for action_probs in probs)
+            backups += 1
+            delta = abs(value - utility[s])
+            utility[s] = value
+            priority[s] = 0.0
+            if delta == 0.0:
+                continue
+            for i in range(indptr[s], indptr[s + 1]):
+                p = predecessors[i]
+                priority[p] += gamma * weights[i] * delta
+                if priority[p] >= threshold:
+                    heapq.heappush(queue, (-priority[p], p))
+
+        # all residuals are below the threshold, so one more backup is within epsilon of the optimum as in VI
+        utility = np.array(utility)
+        q_values = self.get_q_values(utility)
+        self.utility = np.where(active, self.rewards + gamma * q_values.max(axis=0), utility)
+        self.action_indices = np.argmax(q_values, axis=0)
+        self.report['backups'] = backups + int(active.sum())
+        self.report['total_time'] = time.time() - start_time
+        return self.to_policy(self.action_indices)
+
+    def __get_predecessors(self):
+        """
+        Predecessor index in the compressed sparse row format. Terminal predecessors and outcomes with zero
+        probability for all actions are left out.
+        :return: lists (indptr, predecessors, weights), predecessors of the state s are
+        predecessors[indptr[s]:indptr[s + 1]], weights are the matching max_a P(s|p,a)
+        """
+        n = len(self.states)
+        outcomes = len(self.next_states)
+        targets = self.next_states.ravel()
+        sources = np.tile(np.arange(n), outcomes)
+        # several outcomes can end in the same state, e.g. moves into walls, their probabilities add up
+        pairs, inverse = np.unique(targets * n + sources, return_inverse=True)
+        weights = np.zeros(len(pairs))
+        for a in range(len(self.probs)):
+            weights = np.maximum(weights, np.bincount(inverse, weights=np.repeat(self.probs[a], n),
+                                                      minlength=len(pairs)))
+        targets, sources = np.divmod(pairs, n)
+        keep = (weights > 0) & ~self.terminal[sources]
+        targets, sources, weights = targets[keep], sources[keep], weights[keep]
+        indptr = np.searchsorted(targets, np.arange(n + 1))
+        return indptr.tolist(), sources.tolist(), weights.tolist()
+
+
+class __MDP_PI_vectorized_agent(__MDP_vectorized_agent):
+    """
+    MDP agent for setting policy via Policy Iteration algorithm. The policy is evaluated exactly by solving
+    the sparse linear system (I - gamma * P_pi) U = R, or by a fixed number of sweeps (modified policy iteration)
+    when the system is too large.
+    """
+
+    MAX_EXACT_STATES = 250000
+    EVALUATION_SWEEPS = 10
+    # an action is replaced only if it is better by more than this, prevents cycling between equal actions
+    IMPROVEMENT_TOLERANCE = 1e-10
+
+    def __init__(self, env, gamma, evaluation='exact', action_indices=None, utility=None):
+        """
+        :param evaluation: 'exact' or 'modified'
+        :param action_indices: optional initial policy as action indices indexed by state number, greedy one step
+        lookahead if None
+        :param utility: optional initial utilities indexed by state number, only used by the modified evaluation
+        """
+        start_time = time.time()
+        super().__init__(env, gamma)
+        self.__initial_utility = self.get_initial_utility(utility)
+        self.__initial_action_indices = action_indices
+        if evaluation == 'exact' and len(self.states) > self.MAX_EXACT_STATES:
+            evaluation = 'modified'
+        self.evaluation = evaluation
+        self.report = {
+            'states': len(self.states),
+            'evaluation': evaluation,
+            'iterations': 0,
+            'changed_actions': [],
+            'compile_time': time.time() - start_time,
+            'evaluation_time': 0.0,
+            'improvement_time': 0.0,
+        }
+
+    def find_policy(self):
+        active = ~self.terminal
+        utility = self.__initial_utility
+        if self.__initial_action_indices is not None:
+            action_indices = np.array(self.__initial_action_indices, dtype=int)
+        else:
+            # greedy one step lookahead on rewards instead of a random initial policy
+            action_indices = np.argmax(self.get_q_values(utility), axis=0)
+        while True:
+            self.report['iterations'] += 1
+
+            start_time = time.time()
+            if self.evaluation == 'exact':
+                utility = self.__solve_policy(action_indices)
+            else:
+                utility = self.__evaluate_policy(action_indices, utility)
+            self.report['evaluation_time'] += time.time() - start_time
+
+            start_time = time.time()
+            q_values = self.get_q_values(utility)
+            best = np.argmax(q_values, axis=0)
+            states = np.arange(len(self.states))
+            improved = q_values[best, states] > q_values[action_indices, states] + self.IMPROVEMENT_TOLERANCE
+            improved &= active
+            action_indices = np.where(improved, best, action_indices)
+            self.report['improvement_time'] += time.time() - start_time
+            self.report['changed_actions'].append(int(improved.sum()))
+
+            if not improved.any():
+                self.report['total_time'] = self.report['compile_time'] + self.report['evaluation_time'] + \
+                                            self.report['improvement_time']
+                self.utility, self.action_indices = utility, action_indices
+                return self.to_policy(action_indices)
+
+    def __solve_policy(self, action_indices):
+        """
+        Terminal states keep their reward, all other states satisfy U(s) = R(s) + gamma * sum P(s'|s,pi(s)) U(s')
+        :param action_indices: index of the chosen action for every state
+        :return: array of utilities indexed by state number
+        """
+        n = len(self.states)
+        active = ~self.terminal
+        outcomes = len(self.next_states)
+        rows = np.tile(np.arange(n), outcomes)
+        columns = self.next_states.ravel()
+        values = self.probs[action_indices].T.ravel() * np.tile(active, outcomes)
+        transitions = scipy.sparse.csr_matrix((values, (rows, columns)), shape=(n, n))
+        system = scipy.sparse.identity(n, format='csr') - self.gamma * transitions
+        return scipy.sparse.linalg.spsolve(system.tocsc(), self.rewards)
+
+    def __evaluate_policy(self, action_indices, utility, steps=EVALUATION_SWEEPS):
+        """
+        :param action_indices: index of the chosen action for every state
+        :param utility: array of utilities indexed by state number
+        :param steps: number of utility re-evaluations before it is considered stabilized
+        :return: updated array of utilities
+        """
+        active = ~self.terminal
+        probs = self.probs[action_indices].T
+        for i in range(steps):
+            successors = utility[self.next_states]
+            expected = (probs * successors).sum(axis=0)
+            utility = np.where(active, self.rewards + self.gamma * expected, utility)
+        return utility
 # endregion
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+
+import getopt
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from multiprocessing import shared_memory
+import numpy as np
+
+import kuimaze
+from kuimaze.maze import ACTION, ActionProbsTable, weighted_state
+import mdp_agent
+
+
+class BatchSolver(object):
+    """
+    Solves a grid of MDP jobs (map, probs, gamma, epsilon) in a pool of processes. Every map is loaded and compiled
+    once in the main process, its arrays are placed into shared memory and only probability tables travel with
+    the jobs. Workers write policies and utilities of every job to the output directory as .npz files, the main
+    process appends the timing of every finished job to jobs.jsonl as soon as it arrives.
+    """
+
+    # arrays of a map shared with the workers
+    SHARED_ARRAYS = ('xs', 'ys', 'index', 'next_states', 'rewards', 'terminal')
+
+    def __init__(self, jobs, output_dir, method='value_iteration', backend='numpy', processes=None):
+        """
+        :param jobs: list of tuples (map image path, probs (obey, confusionL, confusionR, confusion180), gamma,
+        epsilon), see get_jobs
+        :param output_dir: directory for the results, created if it does not exist
+        :param method: 'value_iteration' or 'policy_iteration'
+        :param backend: backend of value iteration, 'numpy' or 'prioritized'
+        :param processes: size of the process pool, number of CPUs if None
+        """
+        self.jobs = list(jobs)
+        self.output_dir = output_dir
+        self.method = method
+        self.backend = backend
+        self.processes = processes
+        self.maps = sorted(set(job[0] for job in self.jobs))
+        self.duration = None
+
+    @staticmethod
+    def get_jobs(maps, probs_tables, gammas, epsilons):
+        """
+        :return: list of jobs, one for every combination of the parameters
+        """
+        return list(itertools.product(maps, [tuple(probs) for probs in probs_tables], gammas, epsilons))
+
+    def run(self, callback=None):
+        """
+        Solves all jobs
+        :param callback: optional function called with the result of every job as soon as it is finished
+        :return: list of results returned by solve_job, ordered by job id
+        """
+        start_time = time.time()
+        os.makedirs(self.output_dir, exist_ok=True)
+        blocks = []
+        results = []
+        try:
+            shared_maps = {}
+            for map_id, map_image in enumerate(self.maps):
+                shared_maps[map_id] = self.__share_map(map_image, map_id, blocks)
+            tasks = self.__get_tasks()
+            pool = multiprocessing.Pool(self.processes, initializer=init_worker, initargs=(shared_maps,))
+            try:
+                with open(os.path.join(self.output_dir, 'jobs.jsonl'), 'w') as log:
+                    for result in pool.imap_unordered(solve_job, tasks):
+                        log.write(json.dumps(result) + '\n')
+                        log.flush()
+                        results.append(result)
+                        if callback is not None:
+                            callback(result)
+            finally:
+                pool.close()
+                pool.join()
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+        results.sort(key=lambda result: result['job_id'])
+        self.duration = time.time() - start_time
+        return results
+
+    def __get_tasks(self):
+        """
+        :return: list of tuples (job id, map id, map image, probs, probability table, gamma, epsilon, method,
+        backend, output file)
+        """
+        tasks = []
+        map_ids = dict((map_image, map_id) for map_id, map_image in enumerate(self.maps))
+        for job_id, (map_image, probs, gamma, epsilon) in enumerate(self.jobs):
+            probs_table = ActionProbsTable(*probs).matrix.tolist()
+            output_file = os.path.join(self.output_dir, 'job_%d.npz' % job_id)
+            tasks.append((job_id, map_ids[map_image], map_image, list(probs), probs_table, gamma, epsilon,
+                          self.method, self.backend, output_file))
+        return tasks
+
+    def __share_map(self, map_image, map_id, blocks):
+        """
+        Compiles the map and copies its arrays into new shared memory blocks, coordinates of the states are
+        also saved as map_<map id>.npz in the output directory
+        :param blocks: list the created blocks are appended to
+        :return: dictionary {array name: (block name, shape, dtype)}
+        """
+        with redirect_stdout(io.StringIO()):
+            env = kuimaze.MDPMaze(map_image=map_image, probs=(1, 0, 0, 0))
+        states = env.get_all_states()
+        model = env.get_transition_model()
+        arrays = {
+            'xs': model.xs,
+            'ys': model.ys,
+            'index': model.index,
+            'next_states': model.next_states,
+            'rewards': np.array([s.reward for s in states], dtype=float),
+            'terminal': np.array([env.is_goal_state(s) for s in states], dtype=bool),
+        }
+        np.savez(os.path.join(self.output_dir, 'map_%d.npz' % map_id), xs=model.xs.astype(np.int32),
+                 ys=model.ys.astype(np.int32), shape=np.array(model.index.shape))
+        shared = {}
+        for name in BatchSolver.SHARED_ARRAYS:
+            array = arrays[name]
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            blocks.append(block)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            shared[name] = (block.name, array.shape, array.dtype.str)
+        return shared
+
+
+class SharedProblem(object):
+    """
+    Read-only problem built from the arrays of a map in shared memory, provides the part of the kuimaze.MDPMaze
+    interface used by the vectorized agents of mdp_agent
+    """
+
+    def __init__(self, arrays, probs_table):
+        """
+        :param arrays: dictionary of the arrays listed in BatchSolver.SHARED_ARRAYS
+        :param probs_table: probability of outcome (column) for attempted action (row)
+        """
+        self.__states = [weighted_state(x, y, reward) for x, y, reward in
+                         zip(arrays['xs'].tolist(), arrays['ys'].tolist(), arrays['rewards'].tolist())]
+        self.__goals = set((s.x, s.y) for s, terminal in zip(self.__states, arrays['terminal'].tolist()) if terminal)
+        self.actions = list(ACTION)
+        self.xs = arrays['xs']
+        self.ys = arrays['ys']
+        self.index = arrays['index']
+        self.next_states = arrays['next_states']
+        self.probs = np.array(probs_table, dtype=float)
+
+    def get_all_states(self):
+        return self.__states
+
+    def is_goal_state(self, state):
+        return (state.x, state.y) in self.__goals
+
+    def get_transition_model(self):
+        # the problem has the attributes of kuimaze.TransitionModel used by the agents
+        return self
+
+
+# shared memory blocks attached by the worker, {map id: (blocks, arrays)}
+_shared_maps = {}
+_attached_maps = {}
+
+
+def init_worker(shared_maps):
+    """
+    Pool initializer, remembers where the arrays of the maps are, they are attached on first use
+    """
+    _shared_maps.clear()
+    _shared_maps.update(shared_maps)
+    _attached_maps.clear()
+
+
+def get_shared_arrays(map_id):
+    """
+    :return: dictionary {array name: read-only numpy.ndarray backed by shared memory}
+    """
+    if map_id not in _attached_maps:
+        blocks = []
+        arrays = {}
+        for name, (block_name, shape, dtype) in _shared_maps[map_id].items():
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            arrays[name].flags.writeable = False
+        _attached_maps[map_id] = (blocks, arrays)
+    return _attached_maps[map_id][1]
+
+
+def solve_job(task):
+    """
+    Solves one job and saves its result, meant to be run in a worker process. The output file holds
+    'actions' (int8 values of ACTION, -1 for terminal states) and 'utilities' (float64), indexed by state number
+    in the order of the map file.
+    :param task: tuple created by BatchSolver.__get_tasks
+    :return: dictionary with the parameters of the job, the output file and timing in s
+    """
+    job_id, map_id, map_image, probs, probs_table, gamma, epsilon, method, backend, output_file = task
+    start_time = time.time()
+    arrays = get_shared_arrays(map_id)
+    problem = SharedProblem(arrays, probs_table)
+    setup_time = time.time() - start_time
+
+    action_indices, utility, report = mdp_agent.find_policy_arrays(problem, gamma, epsilon, method, backend)
+    solve_time = time.time() - start_time - setup_time
+    actions = np.where(arrays['terminal'], -1, action_indices).astype(np.int8)
+    np.savez(output_file, actions=actions, utilities=np.asarray(utility, dtype=np.float64))
+
+    return {
+        'job_id': job_id,
+        'map': map_image,
+        'map_file': 'map_%d.npz' % map_id,
+        'probs': probs,
+        'gamma': gamma,
+        'epsilon': epsilon,
+        'states': len(actions),
+        'output': os.path.basename(output_file),
+        'setup_time': setup_time,
+        'solve_time': solve_time,
+        'total_time': time.time() - start_time,
+        'report': dict((key, value) for key, value in report.items() if not key.endswith('_time')),
+    }
+
+
+def load_result(output_dir, result):
+    """
+    :param output_dir: output directory of the batch
+    :param result: result of the job, e.g. a line of jobs.jsonl
+    :return: policy and utilities as dictionaries indexed by (x, y), the same as the agents in mdp_agent return
+    """
+    states = np.load(os.path.join(output_dir, result['map_file']))
+    job = np.load(os.path.join(output_dir, result['output']))
+    policy = dict()
+    utilities = dict()
+    for x, y, action, utility in zip(states['xs'].tolist(), states['ys'].tolist(), job['actions'].tolist(),
+                                     job['utilities'].tolist()):
+        policy[x, y] = None if action < 0 else ACTION(action)
+        utilities[x, y] = utility
+    return policy, utilities
+
+
+def print_result(result):
+    print('%4d %-40s %-22s %6.3f %8.1e %8d %8.3f s' % (result['job_id'], result['map'][-40:],
+                                                     ','.join('%g' % p for p in result['probs']), result['gamma'],
+                                                     result['epsilon'], result['states'], result['total_time']))
+
+
+if __name__ == "__main__":
+    usage = 'Usage: python mdp_batch.py [-o output_dir] [-r probs[;probs ...]] [-g gamma[,gamma ...]] ' \
+            '[-e epsilon[,epsilon ...]] [-m value_iteration|policy_iteration] [-b numpy|prioritized] ' \
+            '[-p processes] map1 [map2 ...]'
+    (choices, args) = getopt.getopt(sys.argv[1:], "o:r:g:e:m:b:p:")
+    options = dict(choices)
+
+    if len(args) < 1:
+        print('At least one map must be given.\n' + usage)
+        sys.exit(1)
+
+    probs_tables = [[float(p) for p in probs.split(',')] for probs in options.get('-r', '0.8,0.1,0.1,0').split(';')]
+    jobs = BatchSolver.get_jobs(args, probs_tables,
+                                [float(g) for g in options.get('-g', '0.9').split(',')],
+                                [float(e) for e in options.get('-e', '0.0001').split(',')])
+    solver = BatchSolver(jobs, options.get('-o', 'mdp_results'),
+                         method=options.get('-m', 'value_iteration'),
+                         backend=options.get('-b', 'numpy'),
+                         processes=int(options['-p']) if '-p' in options else None)
+    solver.run(callback=print_result)
+    print('%d jobs, %.1f s' % (len(jobs), solver.duration))
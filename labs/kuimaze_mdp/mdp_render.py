@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Solves a map once and saves its utilities and policy as a PNG image without any GUI. The arrays returned by
+mdp_agent are wrapped in grids and passed to the offscreen renderer as they are.
+Usage: python mdp_render.py [-g gamma] [-e epsilon] [-c cell_size] [-o image.png] map
+"""
+import getopt
+import io
+import sys
+from contextlib import redirect_stdout
+import numpy as np
+
+import kuimaze
+from kuimaze.grids import NO_ACTION
+import mdp_agent
+
+PROBS = [0.8, 0.1, 0.1, 0]
+
+
+def render_solution(map_image, discount_factor, epsilon, filename, cell_size=None):
+    """
+    Solves the map once and draws the returned arrays
+    :return: tuple (PolicyGrid, UtilityGrid) of the saved solution
+    """
+    # the maze prints its setup, drop it
+    with redirect_stdout(io.StringIO()):
+        env = kuimaze.MDPMaze(map_image=map_image, probs=PROBS)
+    env.reset()
+    action_indices, utility, report = mdp_agent.find_policy_arrays(env, discount_factor, epsilon)
+    model = env.get_transition_model()
+    terminal = [env.is_goal_state(s) for s in env.get_all_states()]
+    codes = np.array([action.value for action in model.actions])[action_indices]
+    policy = kuimaze.PolicyGrid(model, np.where(terminal, NO_ACTION, codes))
+    utilities = kuimaze.UtilityGrid(model, utility)
+
+    renderer = env.get_offscreen_renderer(cell_size)
+    renderer.show_values(utilities)
+    renderer.show_policy(policy)
+    renderer.save_png(filename)
+    return policy, utilities
+
+
+if __name__ == "__main__":
+    usage = 'Usage: python mdp_render.py [-g gamma] [-e epsilon] [-c cell_size] [-o image.png] map'
+    (choices, args) = getopt.getopt(sys.argv[1:], "g:e:c:o:")
+    options = dict(choices)
+
+    if len(args) != 1:
+        print('Exactly one map must be given.\n' + usage)
+        sys.exit(1)
+
+    filename = options.get('-o', 'mdp_solution.png')
+    policy, utilities = render_solution(args[0], float(options.get('-g', 0.9)), float(options.get('-e', 0.0001)),
+                                        filename, int(options['-c']) if '-c' in options else None)
+    print('%d states saved to %s' % (len(policy), filename))
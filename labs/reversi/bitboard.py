@@ -0,0 +1,164 @@
+"""
+Bitboard backend for the 8x8 reversi board.
+
+A position is stored as a list of two 64-bit integers indexed by player color (0 and 1), so that
+`board[color]` holds the discs of that player. Bit `i` corresponds to the field `i` of the flattened
+board used in reversiutils, i.e. row `i // 8` and column `i % 8`.
+"""
+
+SIZE = 8
+FIELDS = SIZE * SIZE
+
+FULL = 0xFFFFFFFFFFFFFFFF
+# every column except the first and the last one, prevents wrapping around the board edges
+INNER_COLUMNS = 0x7E7E7E7E7E7E7E7E
+CORNERS = (1 << 0) | (1 << 7) | (1 << 56) | (1 << 63)
+
+# (shift, mask applied to the opponent discs) for the eight directions
+# positive shift moves towards higher indices (east / south), negative towards lower (west / north)
+DIRECTIONS = [
+    (1, INNER_COLUMNS),     # east
+    (-1, INNER_COLUMNS),    # west
+    (8, FULL),              # south
+    (-8, FULL),             # north
+    (9, INNER_COLUMNS),     # south-east
+    (7, INNER_COLUMNS),     # south-west
+    (-7, INNER_COLUMNS),    # north-east
+    (-9, INNER_COLUMNS),    # north-west
+]
+
+
+# region Conversion
+
+def from_board(board, empty_color=-1):
+    """
+    Converts a board given either as a list of lists or a flattened list into bitboards
+    :param board: 8x8 board as used by GameBoard or flattened board as used by reversiutils
+    :param empty_color: value of a free field
+    :returns: list of two bitboards indexed by player color
+    """
+    bits = [0, 0]
+    fields = [j for i in board for j in i] if isinstance(board[0], list) else board
+    for field_id in range(FIELDS):
+        color = fields[field_id]
+        if color != empty_color:
+            bits[color] |= 1 << field_id
+    return bits
+
+
+def to_board(bits, empty_color=-1):
+    """
+    Converts bitboards back into the flattened board representation used by reversiutils
+    :param bits: list of two bitboards indexed by player color
+    :returns: flattened board (list of 64 colors)
+    """
+    board = [empty_color] * FIELDS
+    for color in (0, 1):
+        for field_id in iterate(bits[color]):
+            board[field_id] = color
+    return board
+
+# endregion
+
+# region Move Generation
+
+
+def get_moves(player, opponent):
+    """
+    Generates all legal moves of a player at once using shift-and-mask propagation
+    :param player: bitboard of the player to move
+    :param opponent: bitboard of the opponent
+    :returns: bitboard with a bit set for every legal move
+    """
+    empty = ~(player | opponent) & FULL
+    moves = 0
+    for shift, mask in DIRECTIONS:
+        candidates = opponent & mask
+        if shift > 0:
+            x = (player << shift) & candidates
+            x |= (x << shift) & candidates
+            x |= (x << shift) & candidates
+            x |= (x << shift) & candidates
+            x |= (x << shift) & candidates
+            x |= (x << shift) & candidates
+            moves |= (x << shift) & empty
+        else:
+            shift = -shift
+            x = (player >> shift) & candidates
+            x |= (x >> shift) & candidates
+            x |= (x >> shift) & candidates
+            x |= (x >> shift) & candidates
+            x |= (x >> shift) & candidates
+            x |= (x >> shift) & candidates
+            moves |= (x >> shift) & empty
+    return moves
+
+
+def get_flips(player, opponent, field_id):
+    """
+    Computes the discs flipped by placing a disc on a given field
+    :param player: bitboard of the player to move
+    :param opponent: bitboard of the opponent
+    :param field_id: index of the field (0-63) where the disc is placed
+    :returns: bitboard of the opponent discs that change color, zero if the move is not legal
+    """
+    move = 1 << field_id
+    flips = 0
+    for shift, mask in DIRECTIONS:
+        candidates = opponent & mask
+        line = 0
+        if shift > 0:
+            x = (move << shift) & FULL
+            while x & candidates:
+                line |= x
+                x = (x << shift) & FULL
+        else:
+            x = move >> -shift
+            while x & candidates:
+                line |= x
+                x >>= -shift
+        if x & player:
+            flips |= line
+    return flips
+
+
+def play(bits, color, field_id):
+    """
+    Plays a move in place
+    :param bits: list of two bitboards indexed by player color
+    :param color: color of the player making the move
+    :param field_id: index of the field (0-63)
+    :returns: bitboard of the flipped discs (zero if the move is not legal and nothing was changed)
+    """
+    flips = get_flips(bits[color], bits[1 - color], field_id)
+    if flips:
+        bits[color] |= flips | (1 << field_id)
+        bits[1 - color] ^= flips
+    return flips
+
+# endregion
+
+# region Helpers
+
+
+def iterate(bitboard):
+    """
+    Yields indices of all set bits, from the lowest one
+    """
+    while bitboard:
+        lowest = bitboard & -bitboard
+        yield lowest.bit_length() - 1
+        bitboard ^= lowest
+
+
+def count_empty(bits):
+    return FIELDS - popcount(bits[0] | bits[1])
+
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # python < 3.10
+    def popcount(bitboard):
+        return bin(bitboard).count('1')
+
+# endregion
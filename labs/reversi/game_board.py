@@ -1,4 +1,4 @@
-import copy
+import bitboard
 
 
 class GameBoard(object):
@@ -8,9 +8,12 @@ class GameBoard(object):
         self.p2_color = player2_color
         self.empty_color = empty_color
         self.board = self.init_board()
+        # moves made by make_move as (move, players_color, flipped fields)
+        self.undo_stack = []
 
     def clear(self):
         self.board = self.init_board()
+        self.undo_stack = []
 
     def init_board(self):
         """
@@ -41,6 +44,39 @@ class GameBoard(object):
             if self.confirm_direction(move, dx[i], dy[i], players_color):
                 self.change_stones_in_direction(move, dx[i], dy[i], players_color)
 
+    def make_move(self, move, players_color):
+        """
+        Plays the move in place and pushes the flipped stones on the undo stack, see unmake_move
+        :param move: position where the move is made [x,y], must be a correct move
+        :param players_color: player that made the move
+        :return: list of flipped positions (x, y)
+        """
+        flipped = []
+        dx = [-1, -1, -1, 0, 1, 1, 1, 0]
+        dy = [-1, 0, 1, 1, 1, 0, -1, -1]
+        for i in range(len(dx)):
+            if self.confirm_direction(move, dx[i], dy[i], players_color):
+                posx = move[0] + dx[i]
+                posy = move[1] + dy[i]
+                while self.board[posx][posy] != players_color:
+                    self.board[posx][posy] = players_color
+                    flipped.append((posx, posy))
+                    posx += dx[i]
+                    posy += dy[i]
+        self.board[move[0]][move[1]] = players_color
+        self.undo_stack.append((move, players_color, flipped))
+        return flipped
+
+    def unmake_move(self):
+        """
+        Takes back the last move made by make_move
+        """
+        move, players_color, flipped = self.undo_stack.pop()
+        opponents_color = self.__get_opponent(players_color)
+        for x, y in flipped:
+            self.board[x][y] = opponents_color
+        self.board[move[0]][move[1]] = self.empty_color
+
     def is_correct_move(self, move, players_color):
         """
         Check if the move is correct
@@ -102,6 +138,10 @@ class GameBoard(object):
         """
         :return: True if there is a possible move for player
         """
+        if self.board_size == bitboard.SIZE:
+            bits = self.get_bitboards()
+            return bitboard.get_moves(bits[players_color], bits[self.__get_opponent(players_color)]) != 0
+
         for x in range(self.board_size):
             for y in range(self.board_size):
                 if self.is_correct_move([x, y], players_color):
@@ -109,8 +149,14 @@ class GameBoard(object):
 
         return False
 
+    def get_bitboards(self):
+        """
+        :return: the board as a list of two bitboards indexed by player color, see bitboard.py
+        """
+        return bitboard.from_board(self.board, self.empty_color)
+
     def get_board_copy(self):
-        return copy.deepcopy(self.board)
+        return [row[:] for row in self.board]
 
     def get_score(self):
         stones = [0, 0]
@@ -135,12 +181,23 @@ class GameBoard(object):
 
     def get_all_valid_moves(self, players_color):
         valid_moves = []
-        for x in range(self.board_size):
-            for y in range(self.board_size):
-                if (self.board[x][y] == -1) and self.is_correct_move([x, y], players_color):
-                    valid_moves.append((x, y))
+        if self.board_size == bitboard.SIZE:
+            bits = self.get_bitboards()
+            moves = bitboard.get_moves(bits[players_color], bits[self.__get_opponent(players_color)])
+            valid_moves = [(field_id // self.board_size, field_id % self.board_size)
+                           for field_id in bitboard.iterate(moves)]
+        else:
+            for x in range(self.board_size):
+                for y in range(self.board_size):
+                    if (self.board[x][y] == -1) and self.is_correct_move([x, y], players_color):
+                        valid_moves.append((x, y))
 
         if len(valid_moves) <= 0:
             print('No valid move!')
             return None
         return valid_moves
+
+    def __get_opponent(self, players_color):
+        if players_color == self.p1_color:
+            return self.p2_color
+        return self.p1_color
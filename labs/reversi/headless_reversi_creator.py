@@ -11,13 +11,14 @@ class HeadlessReversiCreator(object):
     Creator of the Reversi game without the GUI.
     """
 
-    def __init__(self, player1, player1_color, player2, player2_color, board_size=8):
+    def __init__(self, player1, player1_color, player2, player2_color, board_size=8, verbose=True):
         """
         :param player1: Instance of first player
         :param player1_color: color of player1
         :param player2: Instance of second player
         :param player1_color: color of player2
         :param board_size: Board will have size [board_size x board_size]
+        :param verbose: if False, nothing is printed during the game
         """
         self.board = GameBoard(board_size, player1_color, player2_color)
         self.player1 = player1
@@ -26,10 +27,16 @@ class HeadlessReversiCreator(object):
         self.current_player_color = player1_color
         self.player1_color = player1_color
         self.player2_color = player2_color
+        self.verbose = verbose
+        # durations of all moves in ms, indexed by player color
+        self.move_times = {player1_color: [], player2_color: []}
+        # color of the player who lost by returning an invalid move
+        self.invalid_move_color = None
 
     def play_game(self):
         """
         This function contains game loop that plays the game.
+        :return: color of the winner, None for a draw
         """
         # TODO: Time limit for move
         correct_finish = True
@@ -38,46 +45,55 @@ class HeadlessReversiCreator(object):
             move = self.current_player.move(self.board.get_board_copy())
             end_time = time.time()
             move_time = (end_time - start_time) * 1000
+            self.move_times[self.current_player_color].append(move_time)
             if move is None:
-                print('Player %d returns None istead of a valid move. Move takes %.3f ms.' % (self.current_player_color,
-                                                                                              move_time))
+                self.log('Player %d returns None istead of a valid move. Move takes %.3f ms.' % (self.current_player_color,
+                                                                                                 move_time))
                 correct_finish = False
                 break
             else:
-                print('Player %d wants move [%d,%d]. Move takes %.3f ms.' % (self.current_player_color,
-                                                                             move[0],
-                                                                             move[1],
-                                                                             move_time))
+                self.log('Player %d wants move [%d,%d]. Move takes %.3f ms.' % (self.current_player_color,
+                                                                                move[0],
+                                                                                move[1],
+                                                                                move_time))
 
             if self.board.is_correct_move(move, self.current_player_color):
-                print('Move is correct')
+                self.log('Move is correct')
                 self.board.play_move(move, self.current_player_color)
 
             else:
-                print('Player %d made the wrong move [%d,%d]' % (self.current_player_color,
-                                                                 move[0],
-                                                                 move[1]))
+                self.log('Player %d made the wrong move [%d,%d]' % (self.current_player_color,
+                                                                    move[0],
+                                                                    move[1]))
                 correct_finish = False
                 break
 
             self.change_player()
             if not self.board.can_play(self.current_player_color):
-                print('No possible move for Player %d' % (self.current_player_color))
+                self.log('No possible move for Player %d' % (self.current_player_color))
                 self.change_player()
                 if self.board.can_play(self.current_player_color):
-                    print('Player %d plays again ' % (self.current_player_color))
+                    self.log('Player %d plays again ' % (self.current_player_color))
                 else:
-                    print('Game over')
+                    self.log('Game over')
 
-            self.board.print_board()
+            if self.verbose:
+                self.board.print_board()
         if correct_finish:
-            self.print_final_score()
+            return self.print_final_score()
         else:
-            print('Game over.')
+            self.invalid_move_color = self.current_player_color
+            self.log('Game over.')
             if self.current_player_color == self.player1_color:
-                print('Winner is player %d.' % (self.player2_color))
+                self.log('Winner is player %d.' % (self.player2_color))
+                return self.player2_color
             else:
-                print('Winner is player %d.' % (self.player1_color))
+                self.log('Winner is player %d.' % (self.player1_color))
+                return self.player1_color
+
+    def log(self, message):
+        if self.verbose:
+            print(message)
 
     def change_player(self):
         """
@@ -91,6 +107,9 @@ class HeadlessReversiCreator(object):
             self.current_player_color = self.player1_color
 
     def print_final_score(self):
+        """
+        :return: color of the winner, None for a draw
+        """
         p1_stones = 0
         p2_stones = 0
         for x in range(self.board.board_size):
@@ -100,18 +119,22 @@ class HeadlessReversiCreator(object):
                 if self.board.board[x][y] == 1:
                     p2_stones += 1
 
-        print('\n\n-----------------------------\n')
-        print('Final score:\n\nPlayer%d:Player%d\n\t[%d:%d]\n' % (self.player1_color,
-                                                                  self.player2_color,
-                                                                  p1_stones,
-                                                                  p2_stones))
+        self.log('\n\n-----------------------------\n')
+        self.log('Final score:\n\nPlayer%d:Player%d\n\t[%d:%d]\n' % (self.player1_color,
+                                                                     self.player2_color,
+                                                                     p1_stones,
+                                                                     p2_stones))
+        winner = None
         if p1_stones > p2_stones:
-            print('Player %d wins!' % (self.player1_color))
+            self.log('Player %d wins!' % (self.player1_color))
+            winner = self.player1_color
         elif p2_stones > p1_stones:
-            print('Player %d wins!' % (self.player2_color))
+            self.log('Player %d wins!' % (self.player2_color))
+            winner = self.player2_color
         else:
-            print('Draw')
-        print('\n-----------------------------\n\n')
+            self.log('Draw')
+        self.log('\n-----------------------------\n\n')
+        return winner
 
 
 if __name__ == "__main__":
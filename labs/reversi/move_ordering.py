@@ -0,0 +1,87 @@
+import bitboard
+
+
+class MoveOrdering(object):
+    """
+    Decides in which order the alpha-beta search tries the moves. This base class keeps the board scan order
+    and only searches the move from the transposition table first, subclasses add heuristics.
+    """
+
+    def new_search(self):
+        """
+        Called before the search of every move of the game
+        """
+        pass
+
+    def order(self, moves, ply, color, tt_move):
+        """
+        :param moves: bitboard of legal moves
+        :param ply: distance of the node from the root
+        :param color: color of the player to move
+        :param tt_move: best move stored in the transposition table or None
+        :returns: list of moves (field indices) in the order they should be searched
+        """
+        ordered = list(bitboard.iterate(moves))
+        if tt_move is not None and tt_move in ordered:
+            ordered.remove(tt_move)
+            ordered.insert(0, tt_move)
+        return ordered
+
+    def record_cutoff(self, move, ply, color, depth):
+        """
+        Called when a move causes a beta cutoff
+        :param depth: remaining depth of the node where the cutoff happened
+        """
+        pass
+
+
+class HeuristicOrdering(MoveOrdering):
+    """
+    Orders moves by the transposition table move first, then killer moves of the given ply,
+    then by the history heuristic combined with the static priority of squares (corners first).
+    """
+
+    KILLERS_PER_PLY = 2
+    MAX_PLY = bitboard.FIELDS + 1
+
+    def __init__(self, square_priority):
+        """
+        :param square_priority: static value of every field, e.g. MyPlayer.SQUARE_WEIGHTS
+        """
+        self.square_priority = square_priority
+        self.killers = [[None] * HeuristicOrdering.KILLERS_PER_PLY for _ in range(HeuristicOrdering.MAX_PLY)]
+        # history of cutoffs indexed by color and field
+        self.history = [[0] * bitboard.FIELDS for _ in (0, 1)]
+
+    def new_search(self):
+        """
+        Killers are indexed by the distance from the root which changes with every move of the game,
+        so they are cleared. History is aged so that recent cutoffs count more.
+        """
+        for killers in self.killers:
+            for i in range(HeuristicOrdering.KILLERS_PER_PLY):
+                killers[i] = None
+        for history in self.history:
+            for i in range(bitboard.FIELDS):
+                history[i] >>= 1
+
+    def order(self, moves, ply, color, tt_move):
+        ordered = list(bitboard.iterate(moves))
+        if len(ordered) < 2:
+            return ordered
+        killers = self.killers[ply]
+        history = self.history[color]
+        priority = self.square_priority
+        ordered.sort(key=lambda move: (move == tt_move, move in killers, history[move] + priority[move]),
+                     reverse=True)
+        return ordered
+
+    def record_cutoff(self, move, ply, color, depth):
+        killers = self.killers[ply]
+        if killers[0] != move:
+            if move in killers:
+                killers.remove(move)
+            else:
+                killers.pop()
+            killers.insert(0, move)
+        self.history[color][move] += depth * depth
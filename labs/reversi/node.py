@@ -1,4 +1,5 @@
-import reversiutils
+import bitboard
+import zobrist
 
 
 class Node:
@@ -6,21 +7,135 @@ class Node:
     DEFAULT_MOVE = None
     DEFAULT_IS_MAX = True
 
-    def __init__(self, board, my_color, opponent_color, move=DEFAULT_MOVE, is_max_node=DEFAULT_IS_MAX):
+    def __init__(self, board, my_color, opponent_color, move=DEFAULT_MOVE, is_max_node=DEFAULT_IS_MAX, key=None,
+                 square_weights=None):
+        """
+        :param board: list of two bitboards indexed by player color, see bitboard.from_board
+        :param my_color: color of the player to move in this node
+        :param opponent_color: color of the other player
+        :param move: index of the field (0-63) played to reach this node
+        :param is_max_node: True if my_color is the color of the searching player
+        :param key: Zobrist hash of the board and side to move, computed from scratch if not given
+        :param square_weights: weights of the fields whose sums are kept up to date for positional evaluation
+        """
         self.board = board
         self.my_color = my_color
         self.opponent_color = opponent_color
         self.is_max_node = is_max_node
         self.move = move
+        self.best_move = Node.DEFAULT_MOVE
         self.score = Node.DEFAULT_SCORE if is_max_node else Node.DEFAULT_SCORE * (-1)
         self.children = []
+        self.key = zobrist.hash_board(board, my_color) if key is None else key
+        # evaluation terms updated incrementally by make_move/unmake_move, indexed by color
+        self.discs = [bitboard.popcount(board[0]), bitboard.popcount(board[1])]
+        self.square_weights = square_weights
+        self.positional = [0, 0]
+        if square_weights is not None:
+            for color in (0, 1):
+                self.positional[color] = sum(square_weights[i] for i in bitboard.iterate(board[color]))
+        # number of moves made by make_move and not taken back yet
+        self.ply = 0
+        # undo stack, preallocated so that making a move allocates no objects
+        self.__undo_flips = [0] * (bitboard.FIELDS + 1)
+        self.__undo_moves = [Node.DEFAULT_MOVE] * (bitboard.FIELDS + 1)
+        self.__undo_keys = [0] * (bitboard.FIELDS + 1)
+        self.__undo_positional = [0] * (bitboard.FIELDS + 1)
+
+    def count_empty(self):
+        return bitboard.FIELDS - self.discs[0] - self.discs[1]
+
+    def get_moves(self):
+        """
+        :returns: bitboard of all legal moves of the player to move
+        """
+        return bitboard.get_moves(self.board[self.my_color], self.board[self.opponent_color])
+
+    def make_move(self, move):
+        """
+        Plays a move in place, the node then represents the child position (the opponent is to move).
+        Flipped discs are recorded so that unmake_move can take the move back.
+        :param move: index of the field (0-63), must be a legal move
+        """
+        my_color = self.my_color
+        opponent_color = self.opponent_color
+        player = self.board[my_color]
+        opponent = self.board[opponent_color]
+        flips = bitboard.get_flips(player, opponent, move)
+        self.board[my_color] = player | flips | (1 << move)
+        self.board[opponent_color] = opponent ^ flips
+
+        # single pass over the flipped discs updates both the hash and the positional sums
+        key = self.key ^ zobrist.KEYS[my_color][move] ^ zobrist.SIDE_KEYS[0] ^ zobrist.SIDE_KEYS[1]
+        flip_keys = zobrist.FLIP_KEYS
+        weights = self.square_weights
+        flipped_weight = 0
+        flip_count = 0
+        for flipped in bitboard.iterate(flips):
+            key ^= flip_keys[flipped]
+            flip_count += 1
+            if weights is not None:
+                flipped_weight += weights[flipped]
+        self.discs[my_color] += flip_count + 1
+        self.discs[opponent_color] -= flip_count
+        if weights is not None:
+            self.positional[my_color] += weights[move] + flipped_weight
+            self.positional[opponent_color] -= flipped_weight
+
+        ply = self.ply
+        self.__undo_flips[ply] = flips
+        self.__undo_moves[ply] = self.move
+        self.__undo_keys[ply] = self.key
+        self.__undo_positional[ply] = flipped_weight
+        self.ply = ply + 1
+
+        self.key = key
+        self.move = move
+        self.my_color = opponent_color
+        self.opponent_color = my_color
+        self.is_max_node = not self.is_max_node
+
+    def unmake_move(self):
+        """
+        Takes back the last move made by make_move
+        """
+        self.ply -= 1
+        ply = self.ply
+        flips = self.__undo_flips[ply]
+        # the player who made the move is the opponent now
+        mover = self.opponent_color
+        other = self.my_color
+        self.board[mover] ^= flips | (1 << self.move)
+        self.board[other] |= flips
+        flip_count = bitboard.popcount(flips)
+        self.discs[mover] -= flip_count + 1
+        self.discs[other] += flip_count
+        if self.square_weights is not None:
+            flipped_weight = self.__undo_positional[ply]
+            self.positional[mover] -= self.square_weights[self.move] + flipped_weight
+            self.positional[other] += flipped_weight
+
+        self.key = self.__undo_keys[ply]
+        self.move = self.__undo_moves[ply]
+        self.my_color = mover
+        self.opponent_color = other
+        self.is_max_node = not self.is_max_node
 
     def get_children(self):
+        """
+        Creates a new node for every legal move, the search itself uses make_move/unmake_move instead
+        """
         children = []
-        valid_moves = reversiutils.get_all_valid_moves(self.board, self.my_color, self.opponent_color)
-        for move in valid_moves:
-            board = reversiutils.simulate_move(self.board, move, self.my_color)
-            child = Node(board, self.opponent_color, self.my_color, move[0], not self.is_max_node)
+        player = self.board[self.my_color]
+        opponent = self.board[self.opponent_color]
+        for move in bitboard.iterate(bitboard.get_moves(player, opponent)):
+            flips = bitboard.get_flips(player, opponent, move)
+            board = [0, 0]
+            board[self.my_color] = player | flips | (1 << move)
+            board[self.opponent_color] = opponent ^ flips
+            key = zobrist.update(self.key, self.my_color, move, flips)
+            child = Node(board, self.opponent_color, self.my_color, move, not self.is_max_node, key,
+                         self.square_weights)
             children.append(child)
         return children
 
@@ -1,14 +1,29 @@
 from node import Node
+import bitboard
 import reversiutils as ru
 import time
+from transposition import TranspositionTable
+from move_ordering import HeuristicOrdering
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time for a move runs out, the unfinished iteration is dropped
+    """
+    pass
 
 
 class MyPlayer(object):
     """
-    Uses MiniMax with alpha-beta pruning for the first 0.5 sec heuristic evaluation afterwards
+    Uses iterative deepening MiniMax with alpha-beta pruning and a transposition table,
+    the move of the last iteration completed within 0.5 sec is played
     """
 
     MAX_WAITING_TIME = 0.5
+    # there are never more than 60 moves left
+    MAX_DEPTH = 60
+    # the clock is read once per this many visited nodes
+    TIME_CHECK_INTERVAL = 64
     # weights for heuristic evaluation
     SQUARE_WEIGHTS = [
          200, -100, 100,  50,  50, 100, -100,  200,
@@ -21,72 +36,186 @@ class MyPlayer(object):
          200, -100, 100,  50,  50, 100, -100,  200,
         ]
 
-    def __init__(self, my_color, opponent_color):
+    def __init__(self, my_color, opponent_color, move_ordering=None):
+        """
+        :param move_ordering: instance of move_ordering.MoveOrdering, HeuristicOrdering by default
+        """
         self.name = 'izotomas'
         self.my_color = my_color
         self.opponent_color = opponent_color
-        self.start_time = 0
+        self.deadline = 0
+        self.nodes = 0
+        self.completed_depth = 0
+        # nodes visited until the end of every completed iteration of the last move
+        self.node_counts = []
+        # nodes visited in all moves of the game
+        self.total_nodes = 0
+        # kept for the whole game, positions searched in previous moves are reused
+        self.transposition_table = TranspositionTable()
+        if move_ordering is None:
+            move_ordering = HeuristicOrdering(MyPlayer.SQUARE_WEIGHTS)
+        self.move_ordering = move_ordering
 
     def move(self, board):
-        board1d = ru.flatten(board)
-        root = Node(board1d, self.my_color, self.opponent_color)
-        self.start_time = time.time()
-        root.children = root.get_children()
-        if not root.children:
+        bits = bitboard.from_board(board)
+        root = Node(bits, self.my_color, self.opponent_color, square_weights=MyPlayer.SQUARE_WEIGHTS)
+        self.deadline = time.time() + MyPlayer.MAX_WAITING_TIME
+        self.nodes = 0
+        self.completed_depth = 0
+        self.node_counts = []
+        moves = root.get_moves()
+        if not moves:
             return None
-        best_move = self.__alpha_beta_search(root)
-        return best_move
+        if bitboard.popcount(moves) == 1:
+            return ru.index_to_cartesian(moves.bit_length() - 1)
+        self.transposition_table.new_search()
+        self.move_ordering.new_search()
+        best_move = self.__iterative_deepening(root, moves)
+        self.total_nodes += self.nodes
+        return ru.index_to_cartesian(best_move)
 
     # region Helpers
 
-    def __alpha_beta_search(self, node):
-        self.__max_value(node, Node.DEFAULT_SCORE, Node.DEFAULT_SCORE * (-1))
-        best_node = max(node.children)
-        coordinates = ru.index_to_cartesian(best_node.move)
-        return coordinates
-
-    def __max_value(self, node, alpha, beta):
-        node.children = node.get_children()
-        if self.__is_terminal_state(node):
-            return self.__evaluate(node)
-        for child in node.children:
-            node.score = max(node.score, self.__min_value(child, alpha, beta))
-            if node.score >= beta:
-                return node.score
-            alpha = max(alpha, node.score)
-        return node.score
-
-    def __min_value(self, node, alpha, beta):
-        node.children = node.get_children()
-        if self.__is_terminal_state(node):
-            return self.__evaluate(node)
-        for child in node.children:
-            node.score = min(node.score, self.__max_value(child, alpha, beta))
-            if node.score <= alpha:
-                return node.score
-            beta = min(beta, node.score)
-        return node.score
-
-    def __is_terminal_state(self, node):
-        move_time = (time.time() - self.start_time)
-        time_expired = move_time > MyPlayer.MAX_WAITING_TIME
-        no_children = not node.children
-        return time_expired or no_children
+    def __iterative_deepening(self, root, moves):
+        """
+        Completes searches of depth 1, 2, 3... until the time runs out. Each iteration searches the best moves
+        found by the previous one first, as they are stored in the transposition table.
+        The root is left in an undefined state when the time runs out in the middle of an iteration.
+        :returns: best move of the last completed iteration
+        """
+        best_move = next(bitboard.iterate(moves))
+        max_depth = min(MyPlayer.MAX_DEPTH, root.count_empty())
+        for depth in range(1, max_depth + 1):
+            try:
+                move = self.__alpha_beta_search(root, depth)
+            except SearchTimeout:
+                break
+            if move is not None:
+                best_move = move
+            self.completed_depth = depth
+            self.node_counts.append(self.nodes)
+        return best_move
+
+    def __alpha_beta_search(self, node, depth):
+        node.best_move = Node.DEFAULT_MOVE
+        self.__max_value(node, Node.DEFAULT_SCORE, Node.DEFAULT_SCORE * (-1), depth)
+        if node.best_move is not None:
+            return node.best_move
+        # root score was taken from the transposition table
+        entry = self.transposition_table.probe(node.key)
+        return entry[TranspositionTable.BEST_MOVE] if entry is not None else None
+
+    def __max_value(self, node, alpha, beta, depth):
+        self.__check_time()
+        alpha_orig, beta_orig = alpha, beta
+        entry = self.transposition_table.probe(node.key)
+        if entry is not None and entry[TranspositionTable.DEPTH] >= depth:
+            score = entry[TranspositionTable.SCORE]
+            flag = entry[TranspositionTable.FLAG]
+            if flag == TranspositionTable.EXACT:
+                return score
+            if flag == TranspositionTable.LOWER_BOUND:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return score
+        moves = node.get_moves()
+        if self.__is_terminal_state(moves, depth):
+            return self.__evaluate(node, moves)
+        best_score = Node.DEFAULT_SCORE
+        best_move = None
+        for move in self.__order_moves(node, moves, entry):
+            node.make_move(move)
+            score = self.__min_value(node, alpha, beta, depth - 1)
+            node.unmake_move()
+            if score > best_score or best_move is None:
+                best_score = score
+                best_move = move
+            if best_score >= beta:
+                self.move_ordering.record_cutoff(move, node.ply, node.my_color, depth)
+                break
+            alpha = max(alpha, best_score)
+        if node.ply == 0:
+            node.best_move = best_move
+        self.__store(node, depth, best_score, alpha_orig, beta_orig, best_move)
+        return best_score
+
+    def __min_value(self, node, alpha, beta, depth):
+        self.__check_time()
+        alpha_orig, beta_orig = alpha, beta
+        entry = self.transposition_table.probe(node.key)
+        if entry is not None and entry[TranspositionTable.DEPTH] >= depth:
+            score = entry[TranspositionTable.SCORE]
+            flag = entry[TranspositionTable.FLAG]
+            if flag == TranspositionTable.EXACT:
+                return score
+            if flag == TranspositionTable.LOWER_BOUND:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return score
+        moves = node.get_moves()
+        if self.__is_terminal_state(moves, depth):
+            return self.__evaluate(node, moves)
+        best_score = Node.DEFAULT_SCORE * (-1)
+        best_move = None
+        for move in self.__order_moves(node, moves, entry):
+            node.make_move(move)
+            score = self.__max_value(node, alpha, beta, depth - 1)
+            node.unmake_move()
+            if score < best_score or best_move is None:
+                best_score = score
+                best_move = move
+            if best_score <= alpha:
+                self.move_ordering.record_cutoff(move, node.ply, node.my_color, depth)
+                break
+            beta = min(beta, best_score)
+        self.__store(node, depth, best_score, alpha_orig, beta_orig, best_move)
+        return best_score
+
+    def __store(self, node, depth, score, alpha, beta, best_move):
+        if score <= alpha:
+            flag = TranspositionTable.UPPER_BOUND
+        elif score >= beta:
+            flag = TranspositionTable.LOWER_BOUND
+        else:
+            flag = TranspositionTable.EXACT
+        self.transposition_table.store(node.key, depth, score, flag, best_move)
+
+    def __order_moves(self, node, moves, entry):
+        """
+        :param moves: bitboard of legal moves
+        :returns: list of moves, ordered by the move ordering with the best move from the transposition table
+        """
+        tt_move = entry[TranspositionTable.BEST_MOVE] if entry is not None else None
+        return self.move_ordering.order(moves, node.ply, node.my_color, tt_move)
+
+    def __check_time(self):
+        self.nodes += 1
+        if self.nodes % MyPlayer.TIME_CHECK_INTERVAL == 0 and time.time() > self.deadline:
+            raise SearchTimeout()
+
+    @staticmethod
+    def __is_terminal_state(moves, depth):
+        no_children = not moves
+        return no_children or depth <= 0
 
     @staticmethod
-    def __evaluate(node):
-        free_position_count = node.board.count(-1)
-        if not node.children or free_position_count == 0:
+    def __evaluate(node, moves):
+        free_position_count = node.count_empty()
+        if not moves or free_position_count == 0:
             return ru.utility(node) * 10000
 
         if free_position_count > 45:
-            return ru.mobility(node) + \
+            return ru.mobility(node, moves) + \
                   4 * ru.positional_strength(node, MyPlayer.SQUARE_WEIGHTS) + \
                   100 * ru.corners(node)
 
         if free_position_count > 30:
             return 10 * ru.parity(node) + \
-                   5 * ru.mobility(node) + \
+                   5 * ru.mobility(node, moves) + \
                    10 * ru.positional_strength(node, MyPlayer.SQUARE_WEIGHTS) + \
                    100 * ru.corners(node)
 
@@ -1,4 +1,5 @@
 import copy
+import bitboard
 
 
 # region Game Logic
@@ -69,30 +70,43 @@ def parity(node):
     Disc count difference between the two players
     :returns: 100 * (Max Player Coins - Min Player Coins ) / (Max Player Coins + Min Player Coins)
     """
-    d1 = node.board.count(node.my_color)
-    d2 = node.board.count(node.opponent_color)
+    d1 = node.discs[node.my_color]
+    d2 = node.discs[node.opponent_color]
     return __get_ratio(node.is_max_node, d1, d2)
 
 
-def mobility(node):
+def mobility(node, moves=None):
     """
     Relative difference between # of possible moves between the two players
+    :param moves: bitboard of moves of the player to move if already generated
     :returns zero or 100 * (Max player moves - Min player moves) / (Max player moves + Min player moves)
     """
-    m1 = len(get_all_valid_moves(node.board, node.my_color, node.opponent_color))
-    m2 = len(get_all_valid_moves(node.board, node.opponent_color, node.my_color))
+    mine = node.board[node.my_color]
+    theirs = node.board[node.opponent_color]
+    if moves is None:
+        moves = bitboard.get_moves(mine, theirs)
+    m1 = bitboard.popcount(moves)
+    m2 = bitboard.popcount(bitboard.get_moves(theirs, mine))
     return __get_ratio(node.is_max_node, m1, m2)
 
 
 def positional_strength(node, positional_heuristics):
+    """
+    Relative difference between sums of weights of fields occupied by the two players
+    :returns zero or 100 * (Max player sum - Min player sum) / (Max player sum + Min player sum)
+    """
+    if node.square_weights is positional_heuristics:
+        # sums kept up to date by the node
+        s1 = node.positional[node.my_color]
+        s2 = node.positional[node.opponent_color]
+        return __get_ratio(node.is_max_node, s1, s2)
 
     s1 = 0
     s2 = 0
-    for i in range(len(node.board)):
-        if node.board[i] == node.my_color:
-            s1 += positional_heuristics[i]
-        elif node.board[i] == node.opponent_color:
-            s2 += positional_heuristics[i]
+    for i in bitboard.iterate(node.board[node.my_color]):
+        s1 += positional_heuristics[i]
+    for i in bitboard.iterate(node.board[node.opponent_color]):
+        s2 += positional_heuristics[i]
     return __get_ratio(node.is_max_node, s1, s2)
 
 
@@ -101,9 +115,8 @@ def corners(node):
     Corners are valuable as they can't be captured
     :returns zero or 100 * (Max player corner count - Min player corner count) / (Max player corner count + Min player corner count)
     """
-    corner_elements = [node.board[0], node.board[7], node.board[56], node.board[63]]
-    c1 = corner_elements.count(node.my_color)
-    c2 = corner_elements.count(node.opponent_color)
+    c1 = bitboard.popcount(node.board[node.my_color] & bitboard.CORNERS)
+    c2 = bitboard.popcount(node.board[node.opponent_color] & bitboard.CORNERS)
     return __get_ratio(node.is_max_node, c1, c2)
 
 
@@ -0,0 +1,279 @@
+import csv
+import getopt
+import io
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+from headless_reversi_creator import HeadlessReversiCreator
+
+
+class Tournament(object):
+    """
+    Round-robin self-play tournament. Every pair of players plays a given number of games with alternating
+    colors, games run in parallel in a pool of processes without any printing.
+    """
+
+    PLAYER1_COLOR = 0
+    PLAYER2_COLOR = 1
+    PERCENTILES = [50, 90, 99]
+    ELO_ITERATIONS = 200
+
+    def __init__(self, player_modules, games_per_pairing=100, processes=None, seed=0):
+        """
+        :param player_modules: names of modules with the MyPlayer class, e.g. ['player', 'random_player']
+        :param games_per_pairing: number of games played by every pair of players
+        :param processes: size of the process pool, number of CPUs if None
+        :param seed: base seed, every game is seeded with seed + game id
+        """
+        self.players = self.__get_labels(player_modules)
+        self.modules = dict(zip(self.players, player_modules))
+        self.games_per_pairing = games_per_pairing
+        self.processes = processes
+        self.seed = seed
+
+    def get_games(self):
+        """
+        :return: list of games to play as tuples (game id, first player, first player module, second player,
+        second player module, seed), the first player moves first
+        """
+        games = []
+        for i in range(len(self.players)):
+            for j in range(i + 1, len(self.players)):
+                for k in range(self.games_per_pairing):
+                    # alternate colors
+                    first, second = (self.players[i], self.players[j]) if k % 2 == 0 \
+                        else (self.players[j], self.players[i])
+                    game_id = len(games)
+                    games.append((game_id, first, self.modules[first], second, self.modules[second],
+                                  self.seed + game_id))
+        return games
+
+    def run(self):
+        """
+        Plays all games
+        :return: dictionary with aggregated results, see get_summary
+        """
+        start_time = time.time()
+        results = []
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            for result in pool.imap_unordered(play_single_game, self.get_games()):
+                results.append(result)
+        finally:
+            pool.close()
+            pool.join()
+        summary = self.get_summary(results)
+        summary['duration_s'] = time.time() - start_time
+        return summary
+
+    def get_summary(self, results):
+        """
+        :param results: list of results returned by play_single_game
+        :return: dictionary with win rates and latencies per player, results per pairing and Elo estimates
+        """
+        players = {}
+        for name in self.players:
+            players[name] = {'games': 0, 'wins': 0, 'draws': 0, 'losses': 0, 'errors': 0, 'move_times': []}
+        pairings = {}
+
+        for result in results:
+            first, second = result['players']
+            pair = tuple(sorted((first, second), key=self.players.index))
+            if pair not in pairings:
+                pairings[pair] = {'games': 0, 'wins': [0, 0], 'draws': 0}
+            pairing = pairings[pair]
+            pairing['games'] += 1
+            for name in (first, second):
+                players[name]['games'] += 1
+                players[name]['move_times'].extend(result['move_times'][name])
+            if result['error'] is not None:
+                players[result['error']]['errors'] += 1
+            if result['winner'] is None:
+                pairing['draws'] += 1
+                players[first]['draws'] += 1
+                players[second]['draws'] += 1
+            else:
+                loser = second if result['winner'] == first else first
+                pairing['wins'][pair.index(result['winner'])] += 1
+                players[result['winner']]['wins'] += 1
+                players[loser]['losses'] += 1
+
+        elo = self.estimate_elo(pairings)
+        summary_players = {}
+        for name, stats in players.items():
+            games = max(stats['games'], 1)
+            summary_players[name] = {
+                'module': self.modules[name],
+                'games': stats['games'],
+                'wins': stats['wins'],
+                'draws': stats['draws'],
+                'losses': stats['losses'],
+                'errors': stats['errors'],
+                'win_rate': stats['wins'] / games,
+                'score_rate': (stats['wins'] + 0.5 * stats['draws']) / games,
+                'elo': elo[name],
+                'moves': len(stats['move_times']),
+                'move_time_ms': self.__get_latencies(stats['move_times']),
+            }
+        summary_pairings = []
+        for (a, b), pairing in pairings.items():
+            summary_pairings.append({
+                'players': [a, b],
+                'games': pairing['games'],
+                'wins': pairing['wins'],
+                'draws': pairing['draws'],
+                'score_rate': (pairing['wins'][0] + 0.5 * pairing['draws']) / pairing['games'],
+            })
+        return {
+            'games': len(results),
+            'games_per_pairing': self.games_per_pairing,
+            'seed': self.seed,
+            'players': summary_players,
+            'pairings': summary_pairings,
+        }
+
+    def estimate_elo(self, pairings):
+        """
+        Maximum likelihood Bradley-Terry ratings (MM algorithm) expressed on the Elo scale, with mean rating 0.
+        Every pairing gets one virtual draw so that ratings stay finite for 100% results.
+        :param pairings: dictionary {(player_a, player_b): {'games': n, 'wins': [a, b], 'draws': d}}
+        :return: dictionary {player: elo}
+        """
+        scores = dict((name, 0.0) for name in self.players)
+        games = {}
+        for (a, b), pairing in pairings.items():
+            scores[a] += pairing['wins'][0] + 0.5 * pairing['draws'] + 0.5
+            scores[b] += pairing['wins'][1] + 0.5 * pairing['draws'] + 0.5
+            games[a, b] = games[b, a] = pairing['games'] + 1
+
+        strength = dict((name, 1.0) for name in self.players)
+        for _ in range(Tournament.ELO_ITERATIONS):
+            updated = {}
+            for name in self.players:
+                denominator = sum(n / (strength[a] + strength[b]) for (a, b), n in games.items() if a == name)
+                updated[name] = scores[name] / denominator if denominator > 0 else strength[name]
+            strength = updated
+
+        ratings = dict((name, 400 * math.log10(strength[name])) for name in self.players)
+        mean = sum(ratings.values()) / len(ratings)
+        return dict((name, rating - mean) for name, rating in ratings.items())
+
+    @staticmethod
+    def write_json(summary, file_name):
+        with open(file_name, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    @staticmethod
+    def write_csv(summary, file_name):
+        """
+        Writes one row per player
+        """
+        percentiles = ['p%d' % p for p in Tournament.PERCENTILES] + ['max']
+        with open(file_name, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['player', 'module', 'games', 'wins', 'draws', 'losses', 'errors', 'win_rate',
+                             'score_rate', 'elo', 'moves'] + ['move_ms_' + p for p in percentiles])
+            for name, stats in summary['players'].items():
+                writer.writerow([name, stats['module'], stats['games'], stats['wins'], stats['draws'],
+                                 stats['losses'], stats['errors'], '%.4f' % stats['win_rate'],
+                                 '%.4f' % stats['score_rate'], '%.1f' % stats['elo'], stats['moves']] +
+                                ['%.3f' % stats['move_time_ms'][p] for p in percentiles])
+
+    @staticmethod
+    def __get_latencies(move_times):
+        """
+        :return: nearest-rank percentiles and maximum of the move durations
+        """
+        latencies = {}
+        ordered = sorted(move_times)
+        for p in Tournament.PERCENTILES:
+            if ordered:
+                rank = max(int(math.ceil(p / 100.0 * len(ordered))), 1)
+                latencies['p%d' % p] = ordered[rank - 1]
+            else:
+                latencies['p%d' % p] = 0.0
+        latencies['max'] = ordered[-1] if ordered else 0.0
+        return latencies
+
+    @staticmethod
+    def __get_labels(player_modules):
+        """
+        The same module can take part more than once, e.g. to play against itself
+        """
+        labels = []
+        for module in player_modules:
+            label = module
+            count = 1
+            while label in labels:
+                count += 1
+                label = '%s#%d' % (module, count)
+            labels.append(label)
+        return labels
+
+
+def play_single_game(game):
+    """
+    Plays one game without printing, meant to be run in a worker process
+    :param game: tuple (game id, first player label, first player module, second player label,
+    second player module, seed)
+    :return: dictionary with the players, the winner (None for a draw), the player who made an invalid move
+    (None if there was none) and durations of moves of both players in ms
+    """
+    game_id, first, first_module, second, second_module, seed = game
+    random.seed(seed)
+    p1_color = Tournament.PLAYER1_COLOR
+    p2_color = Tournament.PLAYER2_COLOR
+    # players are allowed to print, the output is dropped
+    with redirect_stdout(io.StringIO()):
+        p1 = __import__(first_module).MyPlayer(p1_color, p2_color)
+        p2 = __import__(second_module).MyPlayer(p2_color, p1_color)
+        creator = HeadlessReversiCreator(p1, p1_color, p2, p2_color, 8, verbose=False)
+        winner_color = creator.play_game()
+
+    names = {p1_color: first, p2_color: second}
+    return {
+        'game_id': game_id,
+        'seed': seed,
+        'players': [first, second],
+        'winner': names[winner_color] if winner_color is not None else None,
+        'error': names[creator.invalid_move_color] if creator.invalid_move_color is not None else None,
+        'move_times': {first: creator.move_times[p1_color], second: creator.move_times[p2_color]},
+    }
+
+
+def print_summary(summary):
+    print('%d games, %.1f s' % (summary['games'], summary['duration_s']))
+    print('%-20s %6s %6s %6s %6s %8s %8s %10s %10s' % ('player', 'games', 'wins', 'draws', 'losses', 'win %',
+                                                      'elo', 'p50 ms', 'p99 ms'))
+    for name, stats in sorted(summary['players'].items(), key=lambda item: -item[1]['elo']):
+        print('%-20s %6d %6d %6d %6d %8.1f %8.1f %10.3f %10.3f' % (name, stats['games'], stats['wins'],
+                                                                 stats['draws'], stats['losses'],
+                                                                 100 * stats['win_rate'], stats['elo'],
+                                                                 stats['move_time_ms']['p50'],
+                                                                 stats['move_time_ms']['p99']))
+
+
+if __name__ == "__main__":
+    usage = 'Usage: python tournament.py [-n games_per_pairing] [-p processes] [-s seed] ' \
+            '[-j results.json] [-c results.csv] player1 player2 [player3 ...]'
+    (choices, args) = getopt.getopt(sys.argv[1:], "n:p:s:j:c:")
+    options = dict(choices)
+
+    if len(args) < 2:
+        print('At least two players must be given.\n' + usage)
+        sys.exit(1)
+
+    tournament = Tournament(args,
+                            games_per_pairing=int(options.get('-n', 100)),
+                            processes=int(options['-p']) if '-p' in options else None,
+                            seed=int(options.get('-s', 0)))
+    summary = tournament.run()
+    print_summary(summary)
+    if '-j' in options:
+        Tournament.write_json(summary, options['-j'])
+    if '-c' in options:
+        Tournament.write_csv(summary, options['-c'])
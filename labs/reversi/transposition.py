@@ -0,0 +1,59 @@
+class TranspositionTable(object):
+    """
+    Size-bounded hash table of already searched positions, indexed by Zobrist keys (see zobrist.py).
+    Each slot holds a single entry (key, depth, score, flag, best_move, generation). A new entry replaces
+    the stored one if it belongs to the same position, if the stored one comes from an older search
+    or if it was searched at least as deep.
+    """
+
+    EXACT = 0
+    LOWER_BOUND = 1
+    UPPER_BOUND = 2
+
+    # entry fields
+    KEY = 0
+    DEPTH = 1
+    SCORE = 2
+    FLAG = 3
+    BEST_MOVE = 4
+    GENERATION = 5
+
+    def __init__(self, size_bits=18):
+        """
+        :param size_bits: the table has 2 ** size_bits slots
+        """
+        self.size = 1 << size_bits
+        self.mask = self.size - 1
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        """
+        Marks all stored entries as coming from an older search (they are kept, but preferred for replacement)
+        """
+        self.generation += 1
+
+    def clear(self):
+        self.entries = [None] * self.size
+        self.generation = 0
+
+    def probe(self, key):
+        """
+        :returns: entry stored for the given key or None
+        """
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[TranspositionTable.KEY] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, score, flag, best_move):
+        index = key & self.mask
+        old = self.entries[index]
+        if old is None or old[TranspositionTable.KEY] == key \
+                or old[TranspositionTable.GENERATION] != self.generation \
+                or depth >= old[TranspositionTable.DEPTH]:
+            self.entries[index] = (key, depth, score, flag, best_move, self.generation)
+            self.stores += 1
@@ -0,0 +1,44 @@
+"""
+Zobrist hashing of bitboard positions (see bitboard.py) together with the side to move.
+"""
+import random
+import bitboard
+
+# fixed seed - hashes are reproducible between runs and processes
+__random = random.Random(20180507)
+
+#: random key for every (color, field) pair
+KEYS = [[__random.getrandbits(64) for _ in range(bitboard.FIELDS)] for _ in (0, 1)]
+#: random key for every side to move
+SIDE_KEYS = [__random.getrandbits(64) for _ in (0, 1)]
+#: flipping a disc removes it for one color and adds it for the other one
+FLIP_KEYS = [KEYS[0][i] ^ KEYS[1][i] for i in range(bitboard.FIELDS)]
+
+
+def hash_board(board, side_to_move):
+    """
+    Computes the hash of a position from scratch
+    :param board: list of two bitboards indexed by player color
+    :param side_to_move: color of the player to move
+    :returns: 64-bit hash
+    """
+    key = SIDE_KEYS[side_to_move]
+    for color in (0, 1):
+        for field_id in bitboard.iterate(board[color]):
+            key ^= KEYS[color][field_id]
+    return key
+
+
+def update(key, color, field_id, flips):
+    """
+    Updates the hash incrementally after a move, the side to move is passed to the opponent
+    :param key: hash of the position before the move
+    :param color: color of the player making the move
+    :param field_id: index of the field where the disc is placed
+    :param flips: bitboard of the flipped discs
+    :returns: hash of the position after the move
+    """
+    key ^= KEYS[color][field_id] ^ SIDE_KEYS[color] ^ SIDE_KEYS[1 - color]
+    for flipped in bitboard.iterate(flips):
+        key ^= FLIP_KEYS[flipped]
+    return key